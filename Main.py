@@ -1,7 +1,10 @@
+import logging
+
 from app.Controller import MainController
 
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     controller = MainController()
     controller.run()
 
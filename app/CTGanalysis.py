@@ -0,0 +1,161 @@
+import numpy as np
+from scipy.signal import savgol_filter
+
+from app.Profiling import profiled
+
+ACCEL = 1
+DECEL = -1
+
+# One row per contiguous acceleration or deceleration
+EPISODE_DTYPE = np.dtype([
+    ("kind", np.int8),  # ACCEL or DECEL
+    ("start", np.int64),  # First FHR sample of the episode
+    ("end", np.int64),  # Last FHR sample of the episode (inclusive)
+    ("peak_amplitude", np.float64),  # Largest smoothed FHR change in the episode (bpm, signed)
+    ("n_samples", np.int64),
+    ("duration", np.float64),  # Seconds, when a time axis is given
+])
+
+
+def fhr_change(fhr, duration=3):
+    """
+    Return the change of the smoothed FHR over `duration` samples.
+
+    Element i compares the rolling averages starting at i and i + duration and belongs to FHR
+    sample i + duration // 2 (the centre of the window).
+    """
+    fhr = np.asarray(fhr, dtype=float)
+    if fhr.size < 2 * duration:  # One change from 2 * duration samples on, as in LiveCTG
+        return np.empty(0)
+
+    # Smooth FHR using a rolling average to remove small noise
+    smoothed_fhr = np.convolve(fhr, np.ones(duration) / duration, mode='valid')
+    return smoothed_fhr[duration:] - smoothed_fhr[:-duration]
+
+
+def identify_accel_decel(fhr, threshold=0.1, duration=3):
+    """Return the FHR sample indices of accelerations and of decelerations as integer arrays."""
+    change = fhr_change(fhr, duration)
+    accel = change >= threshold
+    decel = (change <= -threshold) & ~accel  # Exclusive, as in the original loop, even for threshold <= 0
+    accel_indices = np.flatnonzero(accel) + duration // 2  # Centre of the window
+    decel_indices = np.flatnonzero(decel) + duration // 2
+    return accel_indices, decel_indices
+
+
+def segment_episodes(fhr, time=None, threshold=0.1, duration=3):
+    """
+    Group accelerations and decelerations into contiguous episodes by run-length encoding.
+
+    Returns a structured array of EPISODE_DTYPE ordered by start sample.
+    """
+    change = fhr_change(fhr, duration)
+    state = np.zeros(change.size, dtype=np.int8)
+    state[change <= -threshold] = DECEL
+    state[change >= threshold] = ACCEL  # Acceleration wins, as in identify_accel_decel
+
+    episodes = np.zeros(0, dtype=EPISODE_DTYPE)
+    if state.size == 0:
+        return episodes
+
+    # Run boundaries are where the state changes
+    boundaries = np.flatnonzero(np.diff(state)) + 1
+    run_starts = np.concatenate(([0], boundaries))
+    run_ends = np.concatenate((boundaries, [state.size])) - 1
+
+    # Largest signed change of every run in one reduceat pass, then keep only accel/decel runs
+    peaks = np.maximum.reduceat(change * state, run_starts)
+    in_episode = state[run_starts] != 0
+    run_starts, run_ends, peaks = run_starts[in_episode], run_ends[in_episode], peaks[in_episode]
+
+    kind = state[run_starts]
+    offset = duration // 2  # Centre of the window
+    episodes = np.zeros(run_starts.size, dtype=EPISODE_DTYPE)
+    episodes["kind"] = kind
+    episodes["start"] = run_starts + offset
+    episodes["end"] = run_ends + offset
+    episodes["peak_amplitude"] = peaks * kind
+    episodes["n_samples"] = run_ends - run_starts + 1
+    if time is not None:
+        time = np.asarray(time, dtype=float)
+        episodes["duration"] = time[episodes["end"]] - time[episodes["start"]]
+    else:
+        episodes["duration"] = np.nan
+    return episodes
+
+
+class CTG_result:
+    """Everything the FHR view plots, as produced by CTG_analysis.analyze."""
+
+    def __init__(self, time, fhr, uc, baseline_fhr, time_stv, stv, accel_indices, decel_indices, episodes):
+        self.time = time
+        self.fhr = fhr
+        self.uc = uc
+        self.baseline_fhr = baseline_fhr
+        self.time_stv = time_stv
+        self.stv = stv
+        self.accel_indices = accel_indices
+        self.decel_indices = decel_indices
+        self.episodes = episodes
+
+
+def _fhr_samples(result, analysis, *args, **kwargs):
+    return len(analysis.fhr)
+
+
+class CTG_analysis:
+    """
+    FHR/UC analysis counterpart of HRV_analysis.
+
+    Methods take and return plain arrays and nothing here imports Qt, so servers and batch jobs can
+    use it without constructing a QApplication.
+    """
+
+    def __init__(self, time, fhr, uc=None):
+        self.time = np.asarray(time, dtype=float)
+        self.fhr = np.asarray(fhr, dtype=float)
+        self.uc = None if uc is None else np.asarray(uc, dtype=float)
+        self.baseline_fhr = None
+        self.stv = None
+        self.accel_indices = None
+        self.decel_indices = None
+        self.episodes = None
+
+    @profiled("CTG_analysis.calculate_baseline", samples=_fhr_samples)
+    def calculate_baseline(self, window_length=15, polyorder=2):
+        """Calculate the baseline FHR using a Savitzky-Golay filter."""
+        self.baseline_fhr = savgol_filter(self.fhr, window_length=window_length, polyorder=polyorder)
+        return self.baseline_fhr
+
+    @profiled("CTG_analysis.calculate_stv", samples=_fhr_samples)
+    def calculate_stv(self):
+        """Calculate the short-term variability as the difference between consecutive FHR values."""
+        self.stv = np.abs(np.diff(self.fhr))
+        return self.stv
+
+    def get_stv_times(self):
+        """Return the time values matching the STV samples."""
+        return self.time[1:]  # Shorten time array to match STV length
+
+    @profiled("CTG_analysis.detect_accel_decel", samples=_fhr_samples)
+    def detect_accel_decel(self, threshold=0.1, duration=3):
+        """Detect accelerations and decelerations, as sample indices and as episodes."""
+        self.accel_indices, self.decel_indices = identify_accel_decel(self.fhr, threshold, duration)
+        self.episodes = segment_episodes(self.fhr, self.time, threshold, duration)
+        return self.accel_indices, self.decel_indices
+
+    def analyze(self, report=None, window_length=15, polyorder=2, threshold=0.1, duration=3):
+        """Run every CTG stage and return a CTG_result; `report(percent, stage)` is called between stages."""
+        report = report or (lambda percent, stage: None)
+
+        report(40, "Baseline")
+        self.calculate_baseline(window_length, polyorder)
+
+        report(60, "Short-term variability")
+        self.calculate_stv()
+
+        report(80, "Accelerations/decelerations")
+        self.detect_accel_decel(threshold, duration)
+
+        return CTG_result(self.time, self.fhr, self.uc, self.baseline_fhr, self.get_stv_times(), self.stv,
+                          self.accel_indices, self.decel_indices, self.episodes)
@@ -1,12 +1,34 @@
-import pandas as pd
-from PyQt5 import QtWidgets
+import os
+
+from PyQt5 import QtWidgets, QtCore, QtGui
 from PyQt5.QtWidgets import QFileDialog
 import numpy as np
 import pyqtgraph as pg
-from scipy.signal import savgol_filter
 
 from app.ui.Design import Ui_MainWindow
-from app.HRVanalysis import HRV_analysis
+from app.Workers import AnalysisWorker
+from app.ResultCache import ResultCache
+from app.HRVtrend import rr_times
+from app.ResultFile import ECG, RESULT_FILE_EXTENSION, export_result, load_result
+from app.Session import Session, RUNNING, is_result_file
+from app.ui.Comparison import ComparisonView
+from app.Profiling import PROFILER, profiled
+
+
+# Live plots are redrawn at most this many times per second
+LIVE_FPS = 10
+
+# Bundled recordings, found from the package so the app can be started from any directory
+DATASETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "datasets")
+
+# Suggested live source per mode (keyed on is_current_mode_HRV): a recording replayed as a simulated device
+DEFAULT_LIVE_SOURCES = {
+    True: os.path.join(DATASETS_DIR, "ECG", "ECG_Person_01_rec_1_raw.csv"),
+    False: os.path.join(DATASETS_DIR, "FHR", "FHR_UC_Time.csv"),
+}
+
+# Sampling frequency of a live ECG whose source cannot tell it (a device stream)
+DEFAULT_LIVE_ECG_FS = 500
 
 
 class MainController:
@@ -17,185 +39,440 @@ class MainController:
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self.MainWindow)
 
+        # Loading and analysis run here, off the GUI thread
+        self.thread_pool = QtCore.QThreadPool.globalInstance()
+        self.worker = None  # Job whose result will be plotted
+        self.workers = set()  # Keeps running jobs alive until they finish
+
+        # Analysed recordings are kept on disk, so reopening one skips the analysis
+        self.result_cache = ResultCache()
+        # Last result shown in each mode (keyed on is_current_mode_HRV), restored when switching back
+        self.last_results = {}
+
+        # Recordings opened together for comparison; analysed in the background and kept in memory
+        self.session = Session(cache=self.result_cache)
+        self.comparison_view = None
+
+        # Live feed state; the timer polls the source and redraws at LIVE_FPS
+        self.live = None
+        self.live_source = None
+        self.live_curves = {}
+        self.live_timer = QtCore.QTimer()
+        self.live_timer.setInterval(1000 // LIVE_FPS)
+        self.live_timer.timeout.connect(self.update_live)
+
         # Connect signals to slots
         self.setupConnections()
 
-        # self.load_data_from_file("static/datasets/ECG/ECG_Person_84_rec_2_raw.csv")
+        # self.start_analysis("static/datasets/ECG/ECG_Person_84_rec_2_raw.csv")
 
     def setupConnections(self):
         """Connect buttons to their respective methods."""
         self.ui.quit_app_button.clicked.connect(self.closeApp)
         self.ui.mode_button.clicked.connect(self.toggle_mode)
         self.ui.upload_signal_button.clicked.connect(self.upload_signal)
+        self.ui.save_button.clicked.connect(self.save_result)
+        self.ui.live_button.clicked.connect(self.toggle_live)
+        self.ui.session_button.clicked.connect(self.open_session)
+
+        # F12 switches stage profiling on and off
+        self.profile_shortcut = QtWidgets.QShortcut(QtGui.QKeySequence("F12"), self.MainWindow)
+        self.profile_shortcut.activated.connect(self.toggle_profiling)
 
     def closeApp(self):
         """Close the application."""
+        self.stop_live()
+        if self.comparison_view is not None:
+            self.comparison_view.close()
         self.app.quit()
 
     def toggle_mode(self):
         """Toggle mode in the design."""
+        self.cancel_analysis()
+        self.stop_live()
         self.ui.toggle_mode_design()
 
+        last = self.last_results.get(self.ui.is_current_mode_HRV)
+        if last is not None:
+            on_result, result = last
+            on_result(result)
+
     def upload_signal(self):
         """Open a file dialog to select a signal file and initiate loading."""
-        filepath, _ = QFileDialog.getOpenFileName(self.MainWindow, "Open Signal File", "", "CSV Files (*.csv);;All Files (*)")
+        filepath, _ = QFileDialog.getOpenFileName(self.MainWindow, "Open Signal File", "",
+                                                  "CSV Files (*.csv);;Result Files (*.npz);;All Files (*)")
         if filepath:
-
-            if self.ui.is_current_mode_HRV:  # Check if HRV mode is activated
-                self.load_data_from_file(filepath)
-
-            else:
-                time, fhr, uc = self.upload_data(filepath)
-
-                if time is not None:
-                    self.ui.clear_all_plots()
-
-                    # Plot Graph 1 & Graph 3: FHR and UC
-                    self.plot_fhr_and_uc(time, fhr, uc)
-
-                    # Plot Graph 2: STV
-                    self.plot_stv(time, fhr)
-
-                    # Plot Graph 4: Accelerations and Decelerations
-                    self.plot_accel_decel(time, fhr)
-
-    def load_data_from_file(self, filepath):
-        """Load data from a given CSV file using Pandas with error handling."""
+            self.start_analysis(filepath)
+
+    def start_analysis(self, filepath):
+        """Load and analyse a file on the thread pool; a newer upload cancels the previous one."""
+        # Imported on first use: the analysis modules pull in SciPy, which would double the startup time
+        from app.Pipelines import analyze_ecg_file, analyze_ctg_file
+
+        self.cancel_analysis()
+        self.stop_live()
+
+        if is_result_file(filepath):
+            # A saved analysis: no CSV parsing or recomputation, shown in the mode it was saved from
+            worker = AnalysisWorker(load_result, filepath)
+            worker.signals.result.connect(lambda loaded: self.worker is worker and self.show_result(*loaded))
+            on_result = None
+        elif self.ui.is_current_mode_HRV:  # Check if HRV mode is activated
+            worker = AnalysisWorker(analyze_ecg_file, filepath, cache=self.result_cache)
+            on_result = self.plot_HRV_results
+        else:
+            worker = AnalysisWorker(analyze_ctg_file, filepath, cache=self.result_cache)
+            on_result = self.plot_FHR_results
+
+        # Results of a superseded job are dropped even if they were already queued
+        if on_result is not None:
+            worker.signals.result.connect(lambda result: self.on_analysis_result(worker, on_result, result))
+        worker.signals.progress.connect(lambda percent, stage: self.worker is worker and self.ui.show_progress(percent, stage))
+        worker.signals.error.connect(lambda message: self.on_analysis_error(worker, filepath, message))
+        worker.signals.finished.connect(lambda: self.workers.discard(worker))
+
+        self.worker = worker
+        self.workers.add(worker)
+        self.thread_pool.start(worker)
+
+    def save_result(self):
+        """Export the result shown in the current mode to a result file, in the background."""
+        last = self.last_results.get(self.ui.is_current_mode_HRV)
+        if last is None:
+            print("Nothing to save: upload a signal first")
+            return
+        filepath, _ = QFileDialog.getSaveFileName(self.MainWindow, "Save Result", "", "Result Files (*.npz)")
+        if not filepath:
+            return
+        if not filepath.lower().endswith(RESULT_FILE_EXTENSION):
+            filepath += RESULT_FILE_EXTENSION
+
+        worker = AnalysisWorker(export_result, filepath, last[1])
+        worker.signals.error.connect(lambda message: print(f"Failed to save {filepath}: {message}"))
+        worker.signals.finished.connect(lambda: self.workers.discard(worker))
+        self.workers.add(worker)
+        self.thread_pool.start(worker)
+
+    def open_session(self):
+        """Add recordings to the session and show the comparison view; recordings are analysed once checked or opened."""
+        filepaths, _ = QFileDialog.getOpenFileNames(self.MainWindow, "Add Recordings", "",
+                                                    "CSV Files (*.csv);;Result Files (*.npz);;All Files (*)")
+        for filepath in filepaths:
+            try:
+                self.session.add(filepath)
+            except (OSError, ValueError) as e:  # e.g. an .npz this app did not write
+                print(f"Could not open {filepath}: {e}")
+
+        if self.comparison_view is None:
+            self.comparison_view = ComparisonView(self.session)
+            self.comparison_view.recording_activated.connect(self.show_recording)
+            self.comparison_view.analysis_needed.connect(self.analyse_recordings)
+        self.comparison_view.refresh()
+        self.comparison_view.show()
+        self.comparison_view.raise_()
+
+    def analyse_recordings(self, recordings, on_done=None):
+        """Analyse session recordings on the thread pool, next to (not instead of) the main upload."""
+        for recording in recordings:
+            worker = AnalysisWorker(self.session.run, recording)
+            worker.signals.result.connect(lambda result, recording=recording: self.on_recording_result(recording, result, on_done))
+            worker.signals.error.connect(lambda message, recording=recording: self.on_recording_error(recording, message))
+            worker.signals.finished.connect(lambda worker=worker: self.workers.discard(worker))
+            recording.status = RUNNING
+            self.workers.add(worker)
+            self.thread_pool.start(worker)
+        if recordings and self.comparison_view is not None:
+            self.comparison_view.refresh()
+
+    def on_recording_result(self, recording, result, on_done=None):
+        self.session.store(recording, result)
+        if self.comparison_view is not None:
+            self.comparison_view.on_recording_updated(recording)
+        if on_done is not None:
+            on_done(recording)
+
+    def on_recording_error(self, recording, message):
+        self.session.fail(recording, message)
+        if self.comparison_view is not None:
+            self.comparison_view.on_recording_updated(recording)
+        print(f"Failed to read or analyse {recording.filepath}: {message}")
+
+    def show_recording(self, recording):
+        """Show a session recording in the main plots, switching mode to match it."""
+        if recording.result is None:
+            # Dropped from memory (or still queued): analyse it, mostly a ResultCache hit, then show it
+            if recording.status != RUNNING:
+                self.analyse_recordings([recording], on_done=self.show_recording)
+            return
+
+        self.session.touch(recording)
+        self.show_result(recording.kind, recording.result)
+
+    def show_result(self, kind, result):
+        """Show an ECG or CTG result in the main plots, switching mode to match it."""
+        self.cancel_analysis()
+        self.stop_live()
+        if (kind == ECG) != self.ui.is_current_mode_HRV:
+            self.ui.toggle_mode_design()
+        on_result = self.plot_HRV_results if kind == ECG else self.plot_FHR_results
+        self.last_results[self.ui.is_current_mode_HRV] = (on_result, result)
+        on_result(result)
+        self.report_profile()
+
+    def toggle_live(self):
+        """Start a live feed from a device or simulator, or stop the running one."""
+        if self.live is not None:
+            self.stop_live()
+            return
+        spec, ok = QtWidgets.QInputDialog.getText(self.MainWindow, "Live Feed",
+                                                  "Device (tcp://host:port) or recording to replay:",
+                                                  text=DEFAULT_LIVE_SOURCES[self.ui.is_current_mode_HRV])
+        if ok and spec:
+            self.start_live(spec)
+
+    def start_live(self, spec):
+        """Stream from `spec` (see LiveFeed.open_source) into the plots of the current mode."""
+        from app.LiveFeed import LiveCTG, LiveECG, open_source
+
+        self.cancel_analysis()
+        self.stop_live()
         try:
-            # Load data using Pandas, which automatically handles malformed files more gracefully
-            data = pd.read_csv(filepath)
-            x_data = data.iloc[:, 0].tolist()  # Assuming the first column contains x-data
-            y_data = data.iloc[:, 1].tolist()  # Assuming the second column contains y-data
-            self.plot_data(x_data, y_data)
-        except pd.errors.EmptyDataError:
-            print("No data: The file is empty.")
-        except pd.errors.ParserError:
-            print("Error parsing data: Check the file format.")
-        except FileNotFoundError:
-            print(f"File not found: {filepath}")
-        except Exception as e:
-            print(f"Failed to read or parse the CSV file: {e}")
-
+            self.live_source = open_source(spec)
+        except (OSError, ValueError) as e:
+            print(f"Could not open live source {spec}: {e}")
+            return
+
+        self.ui.clear_all_plots()
+        self.last_results.pop(self.ui.is_current_mode_HRV, None)
+        if self.ui.is_current_mode_HRV:
+            self.live = LiveECG(fs=self.live_source.fs or DEFAULT_LIVE_ECG_FS)
+            self.live_curves = {
+                "ecg": self.live_curve(self.ui.plot_widget_01, pen='w'),
+                "peaks": self.live_curve(self.ui.plot_widget_01, pen=None, symbol='o', symbolBrush='r', symbolSize=6),
+                "rr": self.live_curve(self.ui.plot_widget_03, pen='w'),
+                "trend": self.live_curve(self.ui.plot_widget_03, pen=pg.mkPen('y', width=2)),
+            }
+        else:
+            self.live = LiveCTG()
+            self.live_curves = {
+                "baseline": self.live_curve(self.ui.plot_widget_01, pen={'color': 'white', 'width': 2}),
+                "stv": self.live_curve(self.ui.plot_widget_02, pen='w'),
+                "uc": self.live_curve(self.ui.plot_widget_03, pen='w'),
+                "fhr": self.live_curve(self.ui.plot_widget_04, pen={'color': 'w', 'width': 1}),
+                "accel": self.live_curve(self.ui.plot_widget_04, pen=None, symbol='o', symbolBrush='g', symbolSize=6),
+                "decel": self.live_curve(self.ui.plot_widget_04, pen=None, symbol='o', symbolBrush='r', symbolSize=6),
+            }
+        self.ui.live_button.setText("Stop")
+        self.live_timer.start()
+
+    def live_curve(self, plot_widget, **plot_kwargs):
+        """An empty curve that is updated in place on every live frame."""
+        curve = plot_widget.plot([], [], **plot_kwargs)
+        curve.setClipToView(True)
+        if plot_kwargs.get('pen', 'w') is not None:
+            curve.setDownsampling(auto=True, method='peak')
+        return curve
+
+    def stop_live(self):
+        if self.live is None:
+            return
+        self.live_timer.stop()
+        self.live_source.close()
+        self.live = self.live_source = None
+        self.live_curves = {}
+        self.ui.live_button.setText("Live")
+
+    def update_live(self):
+        """Timer slot: feed the new samples to the live analysis and redraw (at most LIVE_FPS times a second)."""
+        try:
+            rows = self.live_source.read()
+        except (OSError, ValueError) as e:
+            print(f"Live feed stopped: {e}")
+            self.stop_live()
+            return
+        if not len(rows):
+            return
+        self.live.push(rows)
+        if self.ui.is_current_mode_HRV:  # Switching mode stops the feed, so the mode tells its kind
+            self.draw_live_ecg()
+        else:
+            self.draw_live_ctg()
+
+    @profiled("draw_live_ctg")
+    def draw_live_ctg(self):
+        live, curves = self.live, self.live_curves
+        curves["baseline"].setData(live.baseline_time.view(), live.baseline_fhr.view())
+        curves["stv"].setData(live.stv_time.view(), live.stv.view())
+        curves["uc"].setData(live.time.view(), live.uc.view())
+        curves["fhr"].setData(live.time.view(), live.fhr.view())
+        (accel_time, accel_fhr), (decel_time, decel_fhr) = live.accel_decel()
+        curves["accel"].setData(accel_time, accel_fhr)
+        curves["decel"].setData(decel_time, decel_fhr)
+
+    @profiled("draw_live_ecg")
+    def draw_live_ecg(self):
+        live, curves = self.live, self.live_curves
+        time, ecg = live.time.view(), live.ecg.view()
+        curves["ecg"].setData(time, ecg)
+
+        # Beats still inside the displayed window, mapped to their position in the ring buffer
+        peaks = np.asarray(live.stream.recent_peaks, dtype=np.int64) - (live.ecg.total - len(live.ecg))
+        peaks = peaks[peaks >= 0]
+        curves["peaks"].setData(time[peaks], ecg[peaks])
+
+        rr = live.stream.get_rr_intervals()
+        if len(rr):
+            peak_times = live.stream.get_peak_times()
+            curves["rr"].setData(rr_times(peak_times, rr), rr * 1000)  # Same time axis as plot_HRV_data
+            trend = live.trends()
+            if len(trend):
+                curves["trend"].setData(trend["time"], trend["mean_rr"] * 1000)
+            self.ui.stats_data_label.setText(live.stream.summarize_hrv()[1])
+
+    def cancel_analysis(self):
+        """Cancel the running job, if any; it stops at its next stage."""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+        self.ui.show_progress(None)
+
+    def on_analysis_result(self, worker, on_result, result):
+        if self.worker is worker:
+            self.last_results[self.ui.is_current_mode_HRV] = (on_result, result)
+            on_result(result)
+            self.report_profile()
+
+    def toggle_profiling(self):
+        """Switch stage profiling on or off; the overlay shows the stages of the next upload."""
+        if PROFILER.enabled:
+            PROFILER.disable()
+            self.ui.show_profile_overlay(None)
+        else:
+            PROFILER.reset()
+            PROFILER.enable()
+            self.ui.show_profile_overlay(["Profiling on: upload a signal"])
+
+    def report_profile(self):
+        """Show and log the stages recorded since the last report."""
+        if PROFILER.enabled:
+            self.ui.show_profile_overlay(PROFILER.summary_lines())
+            PROFILER.log_report()
+            PROFILER.reset()
+
+    def on_analysis_error(self, worker, filepath, message):
+        if self.worker is worker:
+            self.ui.show_progress(None)
+        print(f"Failed to read or analyse {filepath}: {message}")
+
+    @profiled("plot_HRV_results")
+    def plot_HRV_results(self, result):
+        """Plot the output of analyze_ecg_file."""
+        self.ui.show_progress(None)
+        self.plot_data(result["time"], result["raw"])
+        self.plot_HRV_data(result)
+
+    @profiled("plot_FHR_results")
+    def plot_FHR_results(self, result):
+        """Plot a CTG_result from analyze_ctg_file."""
+        self.ui.show_progress(None)
+        self.ui.clear_all_plots()
+
+        # Plot Graph 1 & Graph 3: FHR and UC
+        self.plot_fhr_and_uc(result.time, result.baseline_fhr, result.uc)
+
+        # Plot Graph 2: STV
+        self.plot_stv(result.time_stv, result.stv)
+
+        # Plot Graph 4: Accelerations and Decelerations
+        self.plot_accel_decel(result.time, result.fhr, result.accel_indices, result.decel_indices)
+
+    @profiled("plot_data", samples=lambda result, self, x_data, y_data: len(y_data))
     def plot_data(self, x_data, y_data):
         """Plot the data on plot_widget_01 with error handling."""
         try:
-            self.ui.plot_widget_01.clear()
-            self.ui.plot_widget_01.plot(x_data, y_data, pen='w')  # Plot raw ECG data with white pen
-
-            if self.ui.is_current_mode_HRV:  # Check if HRV mode is activated
-                self.plot_HRV_data(x_data, y_data)
+            self.ui.clear_plot(self.ui.plot_widget_01)
+            self.ui.plot_lod(self.ui.plot_widget_01, x_data, y_data, pen='w')  # Plot raw ECG data with white pen
         except Exception as e:
             print(f"Failed to plot data: {e}")
 
-    def plot_HRV_data(self, x_data, y_data):
-        self.filter = HRV_analysis(y_data)  # Initialize filtering with ECG data
+    @profiled("plot_HRV_data", samples=lambda result, self, hrv_result: len(hrv_result["filtered"]))
+    def plot_HRV_data(self, result):
+        self.filter = result["analysis"]
 
-        filtered_y_data = self.filter.apply_filter()  # Filter the ECG data
-        self.ui.plot_widget_02.clear()
-        self.ui.plot_widget_02.plot(x_data, filtered_y_data, pen='w')  # Plot filtered ECG data
+        self.ui.clear_plot(self.ui.plot_widget_02)
+        self.ui.plot_lod(self.ui.plot_widget_02, result["time"], result["filtered"], pen='w')  # Plot filtered ECG data
 
-        hrv_data = self.filter.calculate_hrv()  # Calculate HRV data
-        peak_times = self.filter.get_peak_times()  # Get the peak times corresponding to HRV data
+        hrv_data = result["rr_intervals"]
+        peak_times = result["peak_times"]  # Peak times corresponding to HRV data
 
-        self.ui.plot_widget_03.clear()
+        self.ui.clear_plot(self.ui.plot_widget_03)
         if len(hrv_data) > 1:
             hrv_data_ms = hrv_data * 1000
 
-            self.ui.plot_widget_03.plot(peak_times[:-1], hrv_data_ms, pen='w')
+            self.ui.plot_widget_03.plot(rr_times(peak_times, hrv_data), hrv_data_ms, pen='w')
+
+        trend = result.get("trend")
+        if trend is not None and len(trend):
+            self.plot_hrv_trend(trend)
 
-        _, hrv_summary = self.filter.summarize_hrv()
-        self.ui.stats_data_label.setText(hrv_summary)
+        self.ui.stats_data_label.setText(result["summary_text"])
+
+    def plot_hrv_trend(self, trend):
+        """Overlay the rolling mean RR and a +/- SDNN band (ms) on the RR tachogram."""
+        mean_rr = trend["mean_rr"] * 1000
+        sdnn = trend["sdnn"] * 1000
+        self.ui.plot_widget_03.plot(trend["time"], mean_rr, pen=pg.mkPen('y', width=2))
+        dashed = pg.mkPen('y', style=QtCore.Qt.DashLine)
+        self.ui.plot_widget_03.plot(trend["time"], mean_rr + sdnn, pen=dashed)
+        self.ui.plot_widget_03.plot(trend["time"], mean_rr - sdnn, pen=dashed)
 
     def run(self):
         """Run the application."""
         self.MainWindow.showFullScreen()
         self.app.exec_()
 
-    def upload_data(self, file_path):
-        """
-        Returns:
-            time (array): Time values.
-            fhr (array): Fetal Heart Rate values.
-            uc (array): Uterine Contraction values.
-        """
-        try:
-            # Read CSV file
-            data = pd.read_csv(file_path)
-            time = data['Time'].values
-            fhr = data['FHR'].values
-            uc = data['UC'].values
-
-            return time, fhr, uc
-        except Exception as e:
-            print("Error loading file:", e)
-            return None, None, None
-
-    def plot_fhr_and_uc(self, time, fhr, uc):
+    @profiled("plot_fhr_and_uc")
+    def plot_fhr_and_uc(self, time, baseline_fhr, uc):
         """
         Plot Baseline FHR and UC in two separate PlotWidgets.
 
         Parameters:
             time (array): Time values.
-            fhr (array): Fetal Heart Rate values.
-            uc (array): Uterine Contraction values.
+            baseline_fhr (array): Smoothed Fetal Heart Rate values.
+            uc (array): Uterine Contraction values, or None when the recording has none.
         """
-        # Calculate the baseline FHR using Savitzky-Golay filter
-        baseline_fhr = savgol_filter(fhr, window_length=15, polyorder=2)  # Adjust window_length as needed
-
         # Clear the plot before updating
-        self.ui.plot_widget_01.clear()
+        self.ui.clear_plot(self.ui.plot_widget_01)
 
         # Plot Baseline FHR (smoothed FHR)
-        self.ui.plot_widget_01.plot(time, baseline_fhr, pen={'color': 'white', 'width': 2}, name="Baseline FHR")
+        self.ui.plot_lod(self.ui.plot_widget_01, time, baseline_fhr, pen={'color': 'white', 'width': 2}, name="Baseline FHR")
         # Green line for FHR
-        self.ui.plot_widget_03.plot(time, uc, pen='w')  # Blue line for UC
+        if uc is not None:
+            self.ui.plot_lod(self.ui.plot_widget_03, time, uc, pen='w')  # Blue line for UC
 
-    def plot_stv(self, time, fhr):
+    @profiled("plot_stv")
+    def plot_stv(self, time_stv, stv):
         """
         Plot Short-Term Variability (STV).
 
         Parameters:
-            time (array): Time values.
-            fhr (array): Fetal Heart Rate values.
-            graph_widget2: PyQtGraph widget for plotting.
+            time_stv (array): Time values matching the STV samples.
+            stv (array): Absolute differences between consecutive FHR values.
         """
-
-        stv = np.abs(np.diff(fhr))  # Difference between consecutive FHR values
-
-        time_stv = time[1:]  # Shorten time array to match STV length
-
         # Plot STV
-        self.ui.plot_widget_02.plot(time_stv, stv, title="Short-Term Variability (STV)")
-
-    def plot_accel_decel(self, time, fhr):
-        # Identify accelerations and decelerations
-        accel_indices, decel_indices = self.identify_accel_decel(fhr)
+        self.ui.plot_lod(self.ui.plot_widget_02, time_stv, stv, title="Short-Term Variability (STV)")
 
+    @profiled("plot_accel_decel")
+    def plot_accel_decel(self, time, fhr, accel_indices, decel_indices):
         # Plot FHR as a thin line
-        self.ui.plot_widget_04.plot(time, fhr, pen={'color': 'w', 'width': 1})
+        self.ui.plot_lod(self.ui.plot_widget_04, time, fhr, pen={'color': 'w', 'width': 1})
 
         # Highlight accelerations in green
-        if accel_indices:
+        if len(accel_indices):
             self.ui.plot_widget_04.plot(time[accel_indices], fhr[accel_indices],
                                         pen=None, symbol='o', symbolBrush='g', symbolSize=6)
 
         # Highlight decelerations in red
-        if decel_indices:
+        if len(decel_indices):
             self.ui.plot_widget_04.plot(time[decel_indices], fhr[decel_indices],
                                         pen=None, symbol='o', symbolBrush='r', symbolSize=6)
-
-    def identify_accel_decel(self, fhr, threshold=0.1, duration=3):
-        accel_indices = []
-        decel_indices = []
-
-        # Smooth FHR using a rolling average to remove small noise
-        smoothed_fhr = np.convolve(fhr, np.ones(duration) / duration, mode='valid')
-
-        for i in range(len(smoothed_fhr) - duration):
-            change = smoothed_fhr[i + duration] - smoothed_fhr[i]
-            if change >= threshold:  # Significant increase (acceleration)
-                accel_indices.append(i + duration // 2)  # Center of the window
-            elif change <= -threshold:  # Significant decrease (deceleration)
-                decel_indices.append(i + duration // 2)
-
-        return accel_indices, decel_indices
@@ -0,0 +1,224 @@
+"""
+Columnar CSV loading for ECG (Time, ECG) and CTG (Time, FHR, UC) recordings.
+
+Columns are parsed straight into contiguous float64 arrays, through pyarrow when it is installed
+and pandas otherwise, and never pass through Python lists. After the first parse a binary sidecar
+cache (`<file>.cache.npy` plus `<file>.cache.json`) is written next to the CSV and keyed on the
+file's mtime and size (or its content hash), so reopening a long recording only memory-maps the
+cached array.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from app.Profiling import profiled
+
+CACHE_SUFFIX = ".cache.npy"
+META_SUFFIX = ".cache.json"
+
+# CSVs at least this large are converted to the cache chunk by chunk and then memory-mapped
+LARGE_FILE_BYTES = 64 << 20
+CHUNK_ROWS = 1_000_000
+
+
+def file_fingerprint(filepath, key="mtime"):
+    """Identify the current content of a file, by mtime and size or by a BLAKE2 hash of its bytes."""
+    stat = os.stat(filepath)
+    fingerprint = {"size": stat.st_size}
+    if key == "hash":
+        digest = hashlib.blake2b(digest_size=16)
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        fingerprint["hash"] = digest.hexdigest()
+    else:
+        fingerprint["mtime_ns"] = stat.st_mtime_ns
+    return fingerprint
+
+
+def _cache_paths(filepath, cache_dir=None):
+    directory, name = os.path.split(os.path.abspath(filepath))
+    directory = cache_dir or directory
+    return os.path.join(directory, name + CACHE_SUFFIX), os.path.join(directory, name + META_SUFFIX)
+
+
+def _parse_csv(filepath):
+    """Parse a CSV into (column names, 2-D float64 array with one contiguous row per column)."""
+    if os.path.getsize(filepath) == 0:
+        raise ValueError("No data: The file is empty.")
+
+    try:
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        pa_csv = None
+
+    if pa_csv is not None:
+        table = pa_csv.read_csv(filepath)
+        names = table.column_names
+        data = np.empty((len(names), table.num_rows), dtype=np.float64)
+        for i, column in enumerate(table.columns):
+            data[i] = column.to_numpy()
+    else:
+        import pandas as pd
+
+        frame = pd.read_csv(filepath)
+        names = [str(name) for name in frame.columns]
+        data = np.ascontiguousarray(frame.to_numpy(dtype=np.float64).T)
+    return names, data
+
+
+def _iter_csv_chunks(filepath, chunk_rows=CHUNK_ROWS):
+    """Yield (column names, 2-D float64 chunk with one row per column) without reading the whole file."""
+    try:
+        import pyarrow.csv as pa_csv
+    except ImportError:
+        pa_csv = None
+
+    if pa_csv is not None:
+        reader = pa_csv.open_csv(filepath)
+        names = reader.schema.names
+        for batch in reader:
+            yield names, np.vstack([column.to_numpy(zero_copy_only=False) for column in batch.columns]).astype(np.float64)
+    else:
+        import pandas as pd
+
+        for frame in pd.read_csv(filepath, chunksize=chunk_rows):
+            yield [str(name) for name in frame.columns], frame.to_numpy(dtype=np.float64).T
+
+
+def _count_rows(filepath):
+    """Count the data rows of a CSV (lines after the header) with a fast binary scan."""
+    lines = 0
+    last = b"\n"
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 24), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1  # Final line without a trailing newline
+    return max(0, lines - 1)
+
+
+def _stream_csv_to_cache(filepath, fingerprint, cache_dir=None, chunk_rows=CHUNK_ROWS):
+    """Convert a large CSV into the binary cache chunk by chunk, keeping memory bounded by `chunk_rows`."""
+    cache_path, meta_path = _cache_paths(filepath, cache_dir)
+    n_rows = _count_rows(filepath)
+    data = names = None
+    filled = 0
+    try:
+        for names, chunk in _iter_csv_chunks(filepath, chunk_rows):
+            if data is None:
+                data = np.lib.format.open_memmap(cache_path + ".tmp", mode="w+", dtype=np.float64,
+                                                 shape=(len(names), n_rows))
+            data[:, filled:filled + chunk.shape[1]] = chunk
+            filled += chunk.shape[1]
+        if data is None:
+            raise ValueError("No data: The file is empty.")
+        data.flush()
+        data = None
+
+        if filled != n_rows:
+            # Blank lines were counted but not parsed; shrink the cache to the parsed rows
+            _truncate_cache(cache_path + ".tmp", filled, chunk_rows)
+
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({"fingerprint": fingerprint, "columns": names}, f)
+        os.replace(cache_path + ".tmp", cache_path)
+        os.replace(meta_path + ".tmp", meta_path)
+    except OSError as e:
+        print(f"Could not write cache for {filepath}: {e}")
+        return False
+    finally:
+        # A failed conversion (I/O or parse error) must not leave temporary files next to the CSV
+        data = None
+        for leftover in (cache_path + ".tmp", cache_path + ".tmp.trim", meta_path + ".tmp"):
+            try:
+                os.remove(leftover)
+            except OSError:
+                pass
+    return True
+
+
+def _truncate_cache(path, n_rows, chunk_rows=CHUNK_ROWS):
+    source = np.load(path, mmap_mode="r")
+    target = np.lib.format.open_memmap(path + ".trim", mode="w+", dtype=source.dtype,
+                                       shape=(source.shape[0], n_rows))
+    for start in range(0, n_rows, chunk_rows):
+        target[:, start:start + chunk_rows] = source[:, start:min(start + chunk_rows, n_rows)]
+    target.flush()
+    del source, target
+    os.replace(path + ".trim", path)
+
+
+def _read_cache(filepath, fingerprint, cache_dir=None, mmap_mode="r"):
+    cache_path, meta_path = _cache_paths(filepath, cache_dir)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") != fingerprint:
+            return None
+        return meta["columns"], np.load(cache_path, mmap_mode=mmap_mode)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_cache(filepath, fingerprint, names, data, cache_dir=None):
+    cache_path, meta_path = _cache_paths(filepath, cache_dir)
+    try:
+        # Write to temporary names first so a reader never sees a half-written cache
+        with open(cache_path + ".tmp", "wb") as f:
+            np.save(f, data)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({"fingerprint": fingerprint, "columns": names}, f)
+        os.replace(cache_path + ".tmp", cache_path)
+        os.replace(meta_path + ".tmp", meta_path)
+    except OSError as e:
+        # A read-only data directory only costs us the cache
+        print(f"Could not write cache for {filepath}: {e}")
+
+
+@profiled("load_columns", samples=lambda columns, *args, **kwargs: len(next(iter(columns.values()), ())))
+def load_columns(filepath, use_cache=True, key="mtime", cache_dir=None, mmap_mode="r"):
+    """
+    Load every column of a CSV recording as a dict of contiguous float64 arrays.
+
+    Parameters:
+        filepath (str): CSV file with a header row.
+        use_cache (bool): Read and write the binary sidecar cache.
+        key (str): "mtime" to validate the cache on mtime and size, "hash" to hash the file content.
+        cache_dir (str): Directory for the cache files; defaults to the CSV's directory.
+        mmap_mode (str): Mode used to memory-map cached arrays, or None to load them into memory.
+
+    With the cache enabled, CSVs of LARGE_FILE_BYTES or more are converted chunk by chunk and the
+    returned arrays are memory-mapped, so a long recording is never held in memory as a whole.
+    """
+    if use_cache:
+        fingerprint = file_fingerprint(filepath, key)
+        cached = _read_cache(filepath, fingerprint, cache_dir, mmap_mode)
+        if cached is None and mmap_mode and fingerprint["size"] >= LARGE_FILE_BYTES:
+            if _stream_csv_to_cache(filepath, fingerprint, cache_dir):
+                cached = _read_cache(filepath, fingerprint, cache_dir, mmap_mode)
+        if cached is not None:
+            names, data = cached
+            return dict(zip(names, data))
+
+    names, data = _parse_csv(filepath)
+    if use_cache:
+        _write_cache(filepath, fingerprint, names, data, cache_dir)
+    return dict(zip(names, data))
+
+
+def load_ecg(filepath, **kwargs):
+    """Return (time, ecg) from an ECG recording; the first two columns are used."""
+    columns = list(load_columns(filepath, **kwargs).values())
+    if len(columns) < 2:
+        raise ValueError(f"Expected Time and ECG columns in {filepath}")
+    return columns[0], columns[1]
+
+
+def load_ctg(filepath, **kwargs):
+    """Return (time, fhr, uc) from a CTG recording with Time, FHR and UC columns; uc is None without UC."""
+    columns = load_columns(filepath, **kwargs)
+    return columns['Time'], columns['FHR'], columns.get('UC')
@@ -1,30 +1,121 @@
 import numpy as np
-from scipy.signal import butter, filtfilt, find_peaks
+from scipy.signal import sosfiltfilt
+
+from app.Profiling import profiled
+from app.FilterEngine import design_filter
+from app.HRVfrequency import frequency_domain_metrics, hrv_spectrogram, rr_series
+from app.HRVtrend import hrv_trends
+from app.PeakDetectors import get_detector
+
+
+FREQUENCY_SUMMARY_KEYS = ("Total Power (ms²)", "LF Power (ms²)", "HF Power (ms²)", "LF/HF Ratio")
+
+
+def format_hrv_summary(summary):
+    """Format an HRV summary dictionary into the aligned text shown in the stats panel."""
+    text = f"""
+        {"Mean RR Interval (ms):":<30}         {summary['Mean RR Interval (ms)']}
+        
+        {"SDNN (ms):":<30}                {summary['SDNN (ms)']}
+        {"RMSSD (ms):":<30}               {summary['RMSSD (ms)']}
+        {"pNN50 (%):":<30}                {summary['pNN50 (%)']}
+        
+        {"Min RR Interval (ms):":<30}            {summary['Min RR Interval (ms)']}
+        {"Max RR Interval (ms):":<30}           {summary['Max RR Interval (ms)']}
+        {"Range RR Interval (ms):":<30}         {summary['Range RR Interval (ms)']}
+        
+        {"Outliers (ms):":<30}                 {summary['Outliers (ms)']}
+        
+        {"Histogram:":<30}                  {summary['Histogram'][0]}
+        {" ":<30}                           {summary['Histogram'][1]}
+        """
+    # Frequency-domain fields are only present in summaries of complete recordings
+    frequency_lines = [f"        {key + ':':<30}        {summary[key]}" for key in FREQUENCY_SUMMARY_KEYS if key in summary]
+    if frequency_lines:
+        text += "\n" + "\n".join(frequency_lines) + "\n        "
+    return text
+
+
+def summary_from_json(summary):
+    """A summarize_hrv dictionary read back from JSON, where its Histogram tuple became a list."""
+    if summary is None:
+        return None
+    return {**summary, "Histogram": tuple(summary["Histogram"])}
+
+
+def _data_samples(result, analysis, *args, **kwargs):
+    return len(analysis.data)
 
 
 class HRV_analysis:
-    def __init__(self, data, fs=500):
+    def __init__(self, data, fs=500, detector=None):
         self.data = data
         self.fs = fs  # Sampling frequency
+        # R-peak detector: a PeakDetector, a name from PeakDetectors.DETECTORS, or None for Pan-Tompkins
+        self.detector = get_detector(detector)
         self.filtered_data = None
+        # Assigning rr_intervals also resets _stats_cache: every cached statistic belongs to the array
+        # object assigned last, so assign a new array (or reassign the same one) after changing it in
+        # place, and reassign it before timing a statistic, or the call is answered from the cache
         self.rr_intervals = None
         self.peaks = None
 
+    def design_filter(self, lowcut=1, highcut=50, order=5):
+        """Return the second-order sections of the Butterworth band-pass filter used on the ECG data."""
+        return design_filter(self.fs, lowcut, highcut, order, btype='band')
+
+    @profiled("HRV_analysis.apply_filter", samples=_data_samples)
     def apply_filter(self, lowcut=1, highcut=50, order=5):
         """Apply a Butterworth band-pass filter to the ECG data and store it."""
-        nyq = 0.5 * self.fs
-        low = lowcut / nyq
-        high = highcut / nyq
-        b, a = butter(order, [low, high], btype='band')
-        self.filtered_data = filtfilt(b, a, self.data)
+        sos = self.design_filter(lowcut, highcut, order)
+        self.filtered_data = sosfiltfilt(sos, self.data)
         return self.filtered_data
 
+    @profiled("HRV_analysis.calculate_hrv", samples=_data_samples)
     def calculate_hrv(self):
         """Calculate HRV by detecting R-peaks and returning RR intervals in seconds."""
         if self.filtered_data is None:
             raise ValueError("Filtered data is not available. Please apply filter first.")
 
-        self.peaks, _ = find_peaks(self.filtered_data, height=np.mean(self.filtered_data))
+        self.peaks = self.detector.detect(self.filtered_data, self.fs)
+        self.rr_intervals = np.diff(self.peaks) / self.fs
+
+        return self.rr_intervals
+
+    @profiled("HRV_analysis.calculate_hrv_windowed", samples=_data_samples)
+    def calculate_hrv_windowed(self, window=60, overlap=5, lowcut=1, highcut=50, order=5, filtered_out=None):
+        """
+        Filter and detect R-peaks window by window, for recordings too long to hold several copies of.
+
+        `self.data` can be a memory-mapped array. Each `window`-second block is filtered together with
+        `overlap` seconds of signal on both sides, so filter edge effects fall outside the block and
+        peaks at block boundaries are judged with their real neighbours. Only peaks inside the block
+        are kept, which stitches the windows without duplicates. The peak height threshold is the
+        mean of each filtered window rather than of the whole recording.
+
+        The filtered signal is written to `filtered_out` (e.g. a writable np.memmap) when given and
+        is otherwise not kept, so peak memory is bounded by the window size.
+        """
+        n_samples = len(self.data)
+        window_samples = max(1, int(window * self.fs))
+        overlap_samples = int(overlap * self.fs)
+        sos = self.design_filter(lowcut, highcut, order)
+
+        peaks = []
+        for start in range(0, n_samples, window_samples):
+            end = min(start + window_samples, n_samples)
+            padded_start = max(0, start - overlap_samples)
+            padded_end = min(n_samples, end + overlap_samples)
+
+            segment = sosfiltfilt(sos, np.asarray(self.data[padded_start:padded_end], dtype=float))
+            if filtered_out is not None:
+                filtered_out[start:end] = segment[start - padded_start:end - padded_start]
+
+            window_peaks = self.detector.detect(segment, self.fs) + padded_start
+            peaks.append(window_peaks[(window_peaks >= start) & (window_peaks < end)])
+
+        self.filtered_data = filtered_out
+        self.peaks = np.concatenate(peaks) if peaks else np.empty(0, dtype=np.int64)
         self.rr_intervals = np.diff(self.peaks) / self.fs
 
         return self.rr_intervals
@@ -35,79 +126,141 @@ class HRV_analysis:
             raise ValueError("Peaks data not available. Please calculate HRV first.")
         return self.peaks / self.fs  # Convert peak indices to times
 
+    @property
+    def rr_intervals(self):
+        return self._rr_intervals
+
+    @rr_intervals.setter
+    def rr_intervals(self, value):
+        """Assigning new RR intervals invalidates every cached statistic."""
+        self._rr_intervals = value
+        self._stats_cache = {}
+
+    def _rr_statistics(self):
+        """
+        Compute the intermediates shared by all HRV metrics in one pass and cache them.
+
+        The cache is cleared whenever `rr_intervals` is reassigned; modifying the array in place
+        is not detected. Raises ValueError when there are no RR intervals (fewer than two R-peaks).
+        """
+        stats = self._stats_cache.get("base")
+        if stats is None:
+            rr = np.asarray(self.rr_intervals)
+            if len(rr) == 0:
+                raise ValueError("not enough R-peaks to compute HRV")
+            mean = np.mean(rr)
+            deviation = rr - mean
+            successive_diff = np.diff(rr)
+            sorted_rr = np.sort(rr)
+            stats = {
+                "mean": mean,
+                "deviation": deviation,
+                "std": np.sqrt(np.mean(deviation ** 2)),
+                "successive_diff": successive_diff,
+                "sorted": sorted_rr,
+                "min": sorted_rr[0],
+                "max": sorted_rr[-1],
+            }
+            self._stats_cache["base"] = stats
+        return stats
+
     def calculate_mean_rr(self):
         """Calculate the mean RR interval."""
-        return np.mean(self.rr_intervals)
+        return self._rr_statistics()["mean"]
 
     def calculate_sdnn(self):
         """Calculate the standard deviation of RR intervals (SDNN)."""
-        return np.std(self.rr_intervals)
+        return self._rr_statistics()["std"]
 
     def calculate_rmssd(self):
         """Calculate the root mean square of successive differences (RMSSD)."""
-        successive_diff = np.diff(self.rr_intervals)
+        successive_diff = self._rr_statistics()["successive_diff"]
         return np.sqrt(np.mean(successive_diff ** 2))
 
     def calculate_pnn50(self):
         """Calculate the percentage of RR intervals differing by more than 50 ms."""
-        diff_rr = np.abs(np.diff(self.rr_intervals)) * 1_000  # Convert to ms
+        diff_rr = np.abs(self._rr_statistics()["successive_diff"]) * 1_000  # Convert to ms
         count_pnn50 = np.sum(diff_rr > 50)  # Count RR differences > 50 ms
         return (count_pnn50 / len(self.rr_intervals)) * 100
 
     def calculate_min_max_range(self):
         """Calculate the min, max, and range of RR intervals."""
-        min_rr = np.min(self.rr_intervals)
-        max_rr = np.max(self.rr_intervals)
+        stats = self._rr_statistics()
+        min_rr = stats["min"]
+        max_rr = stats["max"]
         range_rr = max_rr - min_rr
         return min_rr, max_rr, range_rr
 
     def calculate_histogram(self, bins=10):
         """Calculate the histogram of RR intervals."""
-        hist, bin_edges = np.histogram(self.rr_intervals, bins=bins)
-        return hist, bin_edges
+        key = ("histogram", bins)
+        if key not in self._stats_cache:
+            stats = self._rr_statistics()
+            # The known range spares np.histogram its own min/max pass
+            self._stats_cache[key] = np.histogram(stats["sorted"], bins=bins, range=(stats["min"], stats["max"]))
+        return self._stats_cache[key]
 
     def detect_outliers(self, threshold=3):
         """Detect outliers using the Z-score method."""
-        z_scores = np.abs((self.rr_intervals - np.mean(self.rr_intervals)) / np.std(self.rr_intervals))
-        outliers = self.rr_intervals[z_scores > threshold]
-        return outliers
+        key = ("outliers", threshold)
+        if key not in self._stats_cache:
+            stats = self._rr_statistics()
+            z_scores = np.abs(stats["deviation"] / stats["std"])
+            self._stats_cache[key] = np.asarray(self.rr_intervals)[z_scores > threshold]
+        return self._stats_cache[key]
+
+    def calculate_frequency_domain(self, method="welch"):
+        """
+        Calculate VLF/LF/HF power, total power (ms^2) and the LF/HF ratio of the RR series.
+
+        `method` is "welch" (PSD of the tachogram resampled at 4 Hz) or "lomb" (Lomb-Scargle on
+        the uneven beat times). Returns a record of HRVfrequency.BAND_POWER_DTYPE; fields are NaN
+        when there are too few beats.
+        """
+        key = ("frequency", method)
+        if key not in self._stats_cache:
+            times, rr = rr_series(self.get_peak_times(), self.rr_intervals)
+            self._stats_cache[key] = frequency_domain_metrics(times, rr, method=method)
+        return self._stats_cache[key]
+
+    def calculate_spectrogram(self, window=300, step=30, method="welch"):
+        """
+        Return (window start times, freqs, PSD per window, band powers per window) over
+        `window`-second segments of the RR series, `step` seconds apart.
+        """
+        times, rr = rr_series(self.get_peak_times(), self.rr_intervals)
+        return hrv_spectrogram(times, rr, window=window, step=step, method=method)
+
+    def calculate_trends(self, window=300, step=30):
+        """Return rolling mean RR/SDNN/RMSSD/pNN50/min/max RR over `window`-second windows (HRVtrend.TREND_DTYPE rows)."""
+        return hrv_trends(self.get_peak_times(), self.rr_intervals, window=window, step=step)
 
+    @profiled("HRV_analysis.summarize_hrv", samples=lambda result, analysis: len(analysis.rr_intervals))
     def summarize_hrv(self):
         """Return a dictionary summarizing all HRV parameters."""
         if self.rr_intervals is None:
             raise ValueError("RR intervals are not available. Please calculate HRV first.")
 
+        # Every field below is served from the shared, cached intermediates
+        min_rr, max_rr, range_rr = self.calculate_min_max_range()
+        hist, bin_edges = self.calculate_histogram()
+        powers = self.calculate_frequency_domain()
         summary = {
-            "Mean RR Interval (ms)": round(self.calculate_mean_rr() * 10_000, 2),  # Scale to ms and round
-            "SDNN (ms)": round(self.calculate_sdnn() * 1_000, 2),  # Scale to ms and round
-            "RMSSD (ms)": round(self.calculate_rmssd() * 1_000, 2),  # Scale to ms and round
-            "pNN50 (%)": round(self.calculate_pnn50(), 2),  # Round percentage
-            "Min RR Interval (ms)": round(self.calculate_min_max_range()[0] * 1_000),  # Scale and round
-            "Max RR Interval (ms)": round(self.calculate_min_max_range()[1] * 1_000),  # Scale and round
-            "Range RR Interval (ms)": round(self.calculate_min_max_range()[2] * 1_000),  # Scale and round
+            "Mean RR Interval (ms)": round(float(self.calculate_mean_rr()) * 1_000, 2),  # Scale to ms and round
+            "SDNN (ms)": round(float(self.calculate_sdnn()) * 1_000, 2),  # Scale to ms and round
+            "RMSSD (ms)": round(float(self.calculate_rmssd()) * 1_000, 2),  # Scale to ms and round
+            "pNN50 (%)": round(float(self.calculate_pnn50()), 2),  # Round percentage
+            "Min RR Interval (ms)": round(min_rr * 1_000),  # Scale and round
+            "Max RR Interval (ms)": round(max_rr * 1_000),  # Scale and round
+            "Range RR Interval (ms)": round(range_rr * 1_000),  # Scale and round
             "Outliers (ms)": [round(x * 1_000) for x in self.detect_outliers()],  # Scale outliers and round
             "Histogram": (
-                self.calculate_histogram()[0].tolist(),  # Convert array to list for counts
-                [round(edge * 1_000) for edge in self.calculate_histogram()[1]]  # Scale and round edges
-            )
+                hist.tolist(),  # Convert array to list for counts
+                [round(edge * 1_000) for edge in bin_edges]  # Scale and round edges
+            ),
+            "Total Power (ms²)": round(float(powers["total"]), 2),
+            "LF Power (ms²)": round(float(powers["lf"]), 2),
+            "HF Power (ms²)": round(float(powers["hf"]), 2),
+            "LF/HF Ratio": round(float(powers["lf_hf"]), 2),
         }
-        '''   '''
-        # Dynamically format the summary into an aligned string
-        current_stats = f"""
-        {"Mean RR Interval (ms):":<30}         {summary['Mean RR Interval (ms)']}
-        
-        {"SDNN (ms):":<30}                {summary['SDNN (ms)']}
-        {"RMSSD (ms):":<30}               {summary['RMSSD (ms)']}
-        {"pNN50 (%):":<30}                {summary['pNN50 (%)']}
-        
-        {"Min RR Interval (ms):":<30}            {summary['Min RR Interval (ms)']}
-        {"Max RR Interval (ms):":<30}           {summary['Max RR Interval (ms)']}
-        {"Range RR Interval (ms):":<30}         {summary['Range RR Interval (ms)']}
-        
-        {"Outliers (ms):":<30}                 {summary['Outliers (ms)']}
-        
-        {"Histogram:":<30}                  {summary['Histogram'][0]}
-        {" ":<30}                           {summary['Histogram'][1]}
-        """
-
-        return summary, current_stats
+        return summary, format_hrv_summary(summary)
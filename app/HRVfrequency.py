@@ -0,0 +1,184 @@
+"""
+Frequency-domain HRV: VLF/LF/HF power, LF/HF ratio and total power.
+
+RR intervals are placed at the time of the beat that ends them. The Welch path interpolates this
+tachogram onto a uniform grid; the Lomb-Scargle path works on the uneven beat times directly.
+Both have a sliding-window form that computes every window of a long recording in batched NumPy
+calls, which gives a 5-minute-segment spectrogram of a 24 h recording in seconds.
+"""
+import numpy as np
+from scipy.signal import welch
+
+from app.HRVtrend import rr_times
+
+# Standard HRV bands in Hz
+FREQUENCY_BANDS = {
+    "VLF": (0.0033, 0.04),
+    "LF": (0.04, 0.15),
+    "HF": (0.15, 0.4),
+}
+
+# One row per spectrum; powers in ms^2
+BAND_POWER_DTYPE = np.dtype([
+    ("vlf", np.float64),
+    ("lf", np.float64),
+    ("hf", np.float64),
+    ("total", np.float64),
+    ("lf_hf", np.float64),
+])
+
+
+def rr_series(peak_times, rr_intervals=None):
+    """Return (times, rr) with each RR interval (s) placed at the beat that ends it."""
+    peak_times = np.asarray(peak_times, dtype=float)
+    if rr_intervals is None:
+        rr_intervals = np.diff(peak_times)
+    return rr_times(peak_times, rr_intervals), np.asarray(rr_intervals, dtype=float)
+
+
+def resample_tachogram(times, rr, fs=4.0, kind="linear"):
+    """Interpolate the RR series onto a uniform grid at `fs` Hz; returns (grid, rr on the grid)."""
+    grid = np.arange(times[0], times[-1], 1 / fs)
+    if kind == "cubic":
+        from scipy.interpolate import CubicSpline
+
+        return grid, CubicSpline(times, rr)(grid)
+    return grid, np.interp(grid, times, rr)
+
+
+def default_frequencies(max_frequency=0.5, n=256):
+    return np.linspace(FREQUENCY_BANDS["VLF"][0], max_frequency, n)
+
+
+def welch_psd(times, rr, fs=4.0, nperseg=256):
+    """Welch PSD (s^2/Hz) of the resampled tachogram; returns (freqs, psd)."""
+    _, resampled = resample_tachogram(times, rr, fs)
+    return welch(resampled, fs=fs, nperseg=min(nperseg, resampled.size), detrend="linear")
+
+
+def _lomb_scargle(t, y, weights, freqs):
+    """
+    Lomb-Scargle periodogram of several series at once.
+
+    `t`, `y` and `weights` are (series x samples); padded samples carry weight 0 and y 0. Returns
+    (series x freqs) power with the scaling of scipy.signal.lombscargle.
+
+    cos(wt) and sin(wt) are the expensive part. On an evenly spaced frequency grid they are advanced
+    from one frequency to the next with the angle-addition identities instead of being re-evaluated,
+    and the time shift tau is applied to the per-frequency sums rather than to every sample.
+    """
+    steps = np.diff(freqs)
+    uniform = steps.size == 0 or np.allclose(steps, steps[0])
+    if uniform and steps.size:
+        cos_step, sin_step = np.cos(2 * np.pi * steps[0] * t), np.sin(2 * np.pi * steps[0] * t)
+
+    cc, cs, yc, ys = (np.empty((t.shape[0], freqs.size)) for _ in range(4))
+    for k, freq in enumerate(freqs):
+        if k == 0 or not uniform:
+            cos_wt, sin_wt = np.cos(2 * np.pi * freq * t), np.sin(2 * np.pi * freq * t)
+        else:
+            cos_wt, sin_wt = cos_wt * cos_step - sin_wt * sin_step, sin_wt * cos_step + cos_wt * sin_step
+        weighted_cos = cos_wt * weights
+        cc[:, k] = np.einsum("sn,sn->s", weighted_cos, cos_wt)
+        cs[:, k] = np.einsum("sn,sn->s", weighted_cos, sin_wt)
+        yc[:, k] = np.einsum("sn,sn->s", y, cos_wt)
+        ys[:, k] = np.einsum("sn,sn->s", y, sin_wt)
+    ss = weights.sum(axis=1)[:, np.newaxis] - cc
+
+    # tan(2 w tau) = sum sin(2wt) / sum cos(2wt)
+    w_tau = np.arctan2(2 * cs, cc - ss) / 2
+    cos_tau, sin_tau = np.cos(w_tau), np.sin(w_tau)
+    yc_tau = cos_tau * yc + sin_tau * ys
+    ys_tau = cos_tau * ys - sin_tau * yc
+    cross = 2 * cos_tau * sin_tau * cs
+    cc_tau = cos_tau ** 2 * cc + cross + sin_tau ** 2 * ss
+    ss_tau = sin_tau ** 2 * cc - cross + cos_tau ** 2 * ss
+    return 0.5 * (yc_tau ** 2 / cc_tau + ys_tau ** 2 / ss_tau)
+
+
+def lomb_scargle_psd(times, rr, freqs=None):
+    """Lomb-Scargle PSD (s^2/Hz) of the unevenly sampled RR series; returns (freqs, psd)."""
+    freqs = default_frequencies() if freqs is None else np.asarray(freqs, dtype=float)
+    times = np.asarray(times, dtype=float)
+    rr = np.asarray(rr, dtype=float)
+    power = _lomb_scargle((times - times[0])[np.newaxis], (rr - rr.mean())[np.newaxis],
+                          np.ones((1, rr.size)), freqs)[0]
+    # Scale so that integrating over frequency gives the variance of the series
+    return freqs, power * 2 * (times[-1] - times[0]) / rr.size
+
+
+def band_powers(freqs, psd):
+    """
+    Integrate PSDs (s^2/Hz, frequencies along the last axis) over the HRV bands.
+
+    Returns a structured array of BAND_POWER_DTYPE in ms^2 with the shape of psd[..., 0].
+    """
+    psd = np.asarray(psd, dtype=float) * 1e6  # s^2/Hz -> ms^2/Hz
+    powers = np.zeros(psd.shape[:-1], dtype=BAND_POWER_DTYPE)
+    for name, (low, high) in FREQUENCY_BANDS.items():
+        in_band = (freqs >= low) & (freqs < high)
+        powers[name.lower()] = np.trapezoid(psd[..., in_band], freqs[in_band], axis=-1) if in_band.sum() > 1 else 0.0
+    powers["total"] = powers["vlf"] + powers["lf"] + powers["hf"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        powers["lf_hf"] = powers["lf"] / powers["hf"]
+    return powers
+
+
+def frequency_domain_metrics(times, rr, method="welch", fs=4.0):
+    """Return the BAND_POWER_DTYPE record of one RR series using the Welch or Lomb-Scargle PSD."""
+    if len(rr) < 4:
+        powers = np.zeros((), dtype=BAND_POWER_DTYPE)
+        for field in BAND_POWER_DTYPE.names:
+            powers[field] = np.nan
+        return powers
+    if method == "lomb":
+        freqs, psd = lomb_scargle_psd(times, rr)
+    else:
+        freqs, psd = welch_psd(times, rr, fs)
+    return band_powers(freqs, psd)
+
+
+def hrv_spectrogram(times, rr, window=300, step=30, method="welch", fs=4.0, nperseg=256, freqs=None,
+                    batch_size=64):
+    """
+    PSD of every `window`-second segment of the RR series, `step` seconds apart.
+
+    Returns (window start times, freqs, psd of shape windows x freqs, band powers per window).
+    The Welch path resamples the series once and runs one batched `welch` over all windows; the
+    Lomb-Scargle path pads each window's beats to a common length and processes `batch_size`
+    windows together.
+    """
+    times = np.asarray(times, dtype=float)
+    rr = np.asarray(rr, dtype=float)
+    starts = np.arange(times[0], times[-1] - window + 1e-9, step) if times.size else np.empty(0)
+    if starts.size == 0:
+        empty_freqs = default_frequencies() if freqs is None else np.asarray(freqs, dtype=float)
+        return starts, empty_freqs, np.empty((0, empty_freqs.size)), np.zeros(0, dtype=BAND_POWER_DTYPE)
+
+    if method == "lomb":
+        freqs = default_frequencies() if freqs is None else np.asarray(freqs, dtype=float)
+        first = np.searchsorted(times, starts, side="left")
+        last = np.searchsorted(times, starts + window, side="left")
+        counts = last - first
+        offsets = np.arange(max(counts.max(), 1))
+
+        psd = np.empty((starts.size, freqs.size))
+        for batch in range(0, starts.size, batch_size):
+            rows = slice(batch, batch + batch_size)
+            index = np.minimum(first[rows, np.newaxis] + offsets, times.size - 1)
+            weights = (offsets < counts[rows, np.newaxis]).astype(float)
+            t = (times[index] - starts[rows, np.newaxis]) * weights
+            y = rr[index] * weights
+            with np.errstate(invalid="ignore", divide="ignore"):
+                y -= (y.sum(axis=1) / counts[rows])[:, np.newaxis] * weights
+                power = _lomb_scargle(t, y, weights, freqs)
+                psd[rows] = power * 2 * window / counts[rows, np.newaxis]
+    else:
+        grid, resampled = resample_tachogram(times, rr, fs)
+        window_samples = int(round(window * fs))
+        step_samples = int(round(step * fs))
+        segments = np.lib.stride_tricks.sliding_window_view(resampled, window_samples)[::step_samples]
+        starts = grid[0] + np.arange(segments.shape[0]) * step_samples / fs
+        freqs, psd = welch(segments, fs=fs, nperseg=min(nperseg, window_samples), detrend="linear", axis=-1)
+
+    return starts, freqs, psd, band_powers(freqs, psd)
@@ -0,0 +1,182 @@
+import numpy as np
+
+from app.FilterEngine import filter_signal
+from app.PeakDetectors import ThresholdDetector, get_detector
+
+# One row per record; intervals are in seconds and pNN50 in percent, as returned by HRV_analysis
+HRV_METRICS_DTYPE = np.dtype([
+    ("n_intervals", np.int64),
+    ("mean_rr", np.float64),
+    ("sdnn", np.float64),
+    ("rmssd", np.float64),
+    ("pnn50", np.float64),
+    ("min_rr", np.float64),
+    ("max_rr", np.float64),
+    ("range_rr", np.float64),
+    ("n_outliers", np.int64),
+])
+
+
+def pack_rr_sets(rr_sets):
+    """
+    Pack RR interval sets into a flat values array plus record offsets.
+
+    `rr_sets` is either a sequence of 1-D arrays (ragged) or a 2-D array padded with NaN.
+    Record i owns values[offsets[i]:offsets[i + 1]].
+    """
+    if isinstance(rr_sets, np.ndarray) and rr_sets.ndim == 2:
+        valid = ~np.isnan(rr_sets)
+        counts = np.count_nonzero(valid, axis=1)
+        values = rr_sets[valid].astype(float)
+    else:
+        arrays = [np.asarray(rr, dtype=float).ravel() for rr in rr_sets]
+        counts = np.array([rr.size for rr in arrays], dtype=np.int64)
+        values = np.concatenate(arrays) if arrays else np.empty(0)
+
+    offsets = np.zeros(counts.size + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return values, offsets
+
+
+def _segment_reduce(ufunc, values, offsets, empty):
+    """Apply `ufunc.reduceat` per record, filling records without values with `empty`."""
+    n_records = offsets.size - 1
+    result = np.full(n_records, empty, dtype=float)
+    non_empty = offsets[1:] > offsets[:-1]
+    if values.size:
+        result[non_empty] = ufunc.reduceat(values, offsets[:-1][non_empty])
+    return result
+
+
+def time_domain_metrics(rr_sets, outlier_threshold=3):
+    """
+    Compute every time-domain HRV metric for many records in single NumPy passes.
+
+    Accepts the same inputs as `pack_rr_sets` and returns a structured array of HRV_METRICS_DTYPE.
+    """
+    values, offsets = pack_rr_sets(rr_sets)
+    return _packed_time_domain_metrics(values, offsets, outlier_threshold)
+
+
+def _packed_time_domain_metrics(values, offsets, outlier_threshold=3):
+    """Time-domain metrics of RR sets already packed by `pack_rr_sets`."""
+    n_records = offsets.size - 1
+    counts = np.diff(offsets)
+    record_ids = np.repeat(np.arange(n_records), counts)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(record_ids, weights=values, minlength=n_records) / counts
+        deviation = values - mean[record_ids]
+        sdnn = np.sqrt(np.bincount(record_ids, weights=deviation ** 2, minlength=n_records) / counts)
+
+        # Successive differences that stay inside one record
+        same_record = record_ids[1:] == record_ids[:-1]
+        successive_diff = np.diff(values)[same_record]
+        diff_ids = record_ids[1:][same_record]
+        diff_counts = np.bincount(diff_ids, minlength=n_records)
+        rmssd = np.sqrt(np.bincount(diff_ids, weights=successive_diff ** 2, minlength=n_records) / diff_counts)
+        nn50 = np.bincount(diff_ids, weights=np.abs(successive_diff) * 1_000 > 50, minlength=n_records)
+        pnn50 = nn50 / counts * 100
+
+        outliers = np.abs(deviation / sdnn[record_ids]) > outlier_threshold
+
+    metrics = np.zeros(n_records, dtype=HRV_METRICS_DTYPE)
+    metrics["n_intervals"] = counts
+    metrics["mean_rr"] = mean
+    metrics["sdnn"] = sdnn
+    metrics["rmssd"] = rmssd
+    metrics["pnn50"] = pnn50
+    metrics["min_rr"] = _segment_reduce(np.minimum, values, offsets, np.nan)
+    metrics["max_rr"] = _segment_reduce(np.maximum, values, offsets, np.nan)
+    metrics["range_rr"] = metrics["max_rr"] - metrics["min_rr"]
+    metrics["n_outliers"] = np.bincount(record_ids, weights=outliers, minlength=n_records)
+    return metrics
+
+
+class HRV_multi_analysis:
+    """
+    Batched counterpart of HRV_analysis for many recordings of equal length.
+
+    `data` is a (records x samples) array; filtering and the time-domain metrics run along the
+    sample axis for all records at once instead of looping over HRV_analysis in Python. R-peaks are
+    found with the same detector as HRV_analysis (Pan-Tompkins unless `detector` says otherwise),
+    record by record; the threshold detector is evaluated over the whole 2-D array at once.
+    """
+
+    def __init__(self, data, fs=500, detector=None):
+        self.data = np.atleast_2d(np.asarray(data, dtype=float))
+        self.fs = fs  # Sampling frequency
+        # R-peak detector: a PeakDetector, a name from PeakDetectors.DETECTORS, or None for Pan-Tompkins
+        self.detector = get_detector(detector)
+        self.filtered_data = None
+        self.peaks = None  # Sample index of every detected peak
+        self.peak_records = None  # Record each peak belongs to
+        self.rr_intervals = None  # Flat RR intervals of all records
+        self.rr_offsets = None  # Record i owns rr_intervals[rr_offsets[i]:rr_offsets[i + 1]]
+
+    @property
+    def n_records(self):
+        return self.data.shape[0]
+
+    def apply_filter(self, lowcut=1, highcut=50, order=5):
+        """Apply the Butterworth band-pass filter to every record in one call."""
+        self.filtered_data = filter_signal(self.data, self.fs, lowcut, highcut, order, axis=-1)
+        return self.filtered_data
+
+    def calculate_hrv(self):
+        """
+        Detect R-peaks in every record and return the RR intervals as a list of arrays.
+
+        The peaks are those HRV_analysis.calculate_hrv finds with the same detector.
+        """
+        if self.filtered_data is None:
+            raise ValueError("Filtered data is not available. Please apply filter first.")
+
+        if isinstance(self.detector, ThresholdDetector):
+            self.peak_records, self.peaks = self._threshold_peaks(self.filtered_data)
+        else:
+            peaks = [self.detector.detect(record, self.fs) for record in self.filtered_data]
+            self.peak_records = np.repeat(np.arange(self.n_records), [p.size for p in peaks])
+            self.peaks = np.concatenate(peaks) if peaks else np.empty(0, dtype=np.int64)
+
+        # RR intervals are the differences between consecutive peaks of the same record
+        same_record = self.peak_records[1:] == self.peak_records[:-1]
+        self.rr_intervals = (np.diff(self.peaks) / self.fs)[same_record]
+
+        peak_counts = np.bincount(self.peak_records, minlength=self.n_records)
+        self.rr_offsets = np.zeros(self.n_records + 1, dtype=np.int64)
+        np.cumsum(np.maximum(peak_counts - 1, 0), out=self.rr_offsets[1:])
+
+        return self.get_rr_intervals()
+
+    @staticmethod
+    def _threshold_peaks(x):
+        """
+        ThresholdDetector (local maxima above the record mean) as one comparison over the 2-D array.
+
+        Returns (record, sample index) of every peak. Unlike find_peaks, flat-topped maxima are not reported.
+        """
+        centre = x[:, 1:-1]
+        height = np.mean(x, axis=1, keepdims=True)
+        is_peak = (centre > x[:, :-2]) & (centre > x[:, 2:]) & (centre >= height)
+        records, peaks = np.nonzero(is_peak)
+        return records, peaks + 1  # Account for the dropped first sample
+
+    def get_rr_intervals(self):
+        """Return the RR intervals of each record as a list of array views."""
+        if self.rr_intervals is None:
+            raise ValueError("RR intervals are not available. Please calculate HRV first.")
+        return np.split(self.rr_intervals, self.rr_offsets[1:-1])
+
+    def get_peak_times(self):
+        """Return the R-peak times of each record as a list of arrays."""
+        if self.peaks is None:
+            raise ValueError("Peaks data not available. Please calculate HRV first.")
+        splits = np.cumsum(np.bincount(self.peak_records, minlength=self.n_records))[:-1]
+        return np.split(self.peaks / self.fs, splits)
+
+    def summarize_hrv(self, outlier_threshold=3):
+        """Return the time-domain metrics of every record as a structured array."""
+        if self.rr_intervals is None:
+            raise ValueError("RR intervals are not available. Please calculate HRV first.")
+        return _packed_time_domain_metrics(self.rr_intervals, self.rr_offsets, outlier_threshold)
@@ -0,0 +1,197 @@
+from collections import deque
+
+import numpy as np
+from scipy.signal import sosfilt, find_peaks
+
+from app.HRVanalysis import format_hrv_summary
+from app.FilterEngine import design_filter, initial_state
+
+
+class HRV_stream:
+    """
+    Streaming counterpart of HRV_analysis for bedside monitoring.
+
+    ECG is pushed in chunks through `process_chunk`. The band-pass filter is causal and keeps its
+    state between chunks, R-peaks are confirmed once a full refractory period has been seen after
+    them, and the RR statistics are updated from running sums. Per-chunk work is proportional to the
+    chunk length and memory does not grow with the length of the session.
+
+    The detectors in PeakDetectors need the whole record, so peaks are found here with a causal
+    rule of their own (maxima above `threshold_ratio` of the running peak level, a refractory
+    period apart). Its beats can differ from those HRV_analysis finds with Pan-Tompkins on the
+    same recording.
+    """
+
+    def __init__(self, fs=500, lowcut=1, highcut=50, order=5, refractory=0.25, threshold_ratio=0.5,
+                 history=4096, warmup=2.0):
+        self.fs = fs  # Sampling frequency
+        self.threshold_ratio = threshold_ratio
+        self.refractory_samples = max(1, int(round(refractory * fs)))
+        self.warmup_samples = max(self.refractory_samples, int(round(warmup * fs)))
+
+        self.sos = design_filter(fs, lowcut, highcut, order, btype='band')
+
+        # Recent beats kept for plotting, outliers and the histogram
+        self.recent_peaks = deque(maxlen=history)
+        self.recent_rr = deque(maxlen=history)
+
+        self.reset()
+
+    def reset(self):
+        """Drop all filter, detector and statistics state."""
+        self._zi = None
+        self.samples_seen = 0
+
+        # Filtered samples not yet confirmed by the detector, plus one refractory period of context
+        self._tail = np.empty(0)
+        self._tail_start = 0
+        self._confirmed_until = 0
+        self._last_peak = None
+        self._peak_level = None
+
+        self.recent_peaks.clear()
+        self.recent_rr.clear()
+
+        # Running RR statistics
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min = np.inf
+        self._max = -np.inf
+        self._diff_count = 0
+        self._diff_sumsq = 0.0
+        self._nn50 = 0
+        self._last_rr = None
+
+    def process_chunk(self, chunk):
+        """Filter a chunk of raw ECG, update the RR statistics and return the newly confirmed peak indices."""
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.size == 0:
+            return np.empty(0, dtype=np.int64)
+
+        if self._zi is None:
+            self._zi = initial_state(self.sos, chunk[0])
+        filtered, self._zi = sosfilt(self.sos, chunk, zi=self._zi)
+        self.samples_seen += chunk.size
+
+        new_peaks = self._detect_peaks(filtered)
+        if new_peaks.size:
+            self._update_rr(new_peaks)
+        return new_peaks
+
+    def _detect_peaks(self, filtered):
+        """Refractory-aware peak detection over the unconfirmed tail plus the new filtered samples."""
+        buffer = np.concatenate((self._tail, filtered))
+        start = self._tail_start
+        refractory = self.refractory_samples
+
+        if self._peak_level is None:
+            # Seed the adaptive threshold from the first couple of seconds of signal
+            if buffer.size < self.warmup_samples:
+                self._tail = buffer
+                return np.empty(0, dtype=np.int64)
+            self._peak_level = np.max(buffer)
+
+        # A peak is only final once a refractory period has passed without a taller one
+        confirm_limit = buffer.size - refractory
+        candidates, properties = find_peaks(buffer, height=self.threshold_ratio * self._peak_level,
+                                            distance=refractory)
+
+        accepted = []
+        for index, height in zip(candidates, properties['peak_heights']):
+            if index >= confirm_limit:
+                break
+            peak = start + index
+            if peak < self._confirmed_until:
+                continue
+            if self._last_peak is not None and peak - self._last_peak < refractory:
+                continue
+            accepted.append(peak)
+            self._last_peak = peak
+            self._peak_level = 0.875 * self._peak_level + 0.125 * height
+
+        self._confirmed_until = max(self._confirmed_until, start + confirm_limit)
+        keep_from = max(0, confirm_limit - refractory)
+        self._tail = buffer[keep_from:]
+        self._tail_start = start + keep_from
+
+        return np.asarray(accepted, dtype=np.int64)
+
+    def _update_rr(self, new_peaks):
+        """Merge the RR intervals ending at the new peaks into the running statistics."""
+        previous = self.recent_peaks[-1] if self.recent_peaks else None
+        self.recent_peaks.extend(new_peaks.tolist())
+        if previous is not None:
+            new_peaks = np.concatenate(([previous], new_peaks))
+        if new_peaks.size < 2:
+            return
+
+        rr = np.diff(new_peaks) / self.fs
+        self.recent_rr.extend(rr.tolist())
+
+        # Chan's parallel update keeps the variance stable over hours of beats
+        n = rr.size
+        chunk_mean = np.mean(rr)
+        chunk_m2 = np.sum((rr - chunk_mean) ** 2)
+        total = self._count + n
+        delta = chunk_mean - self._mean
+        self._mean += delta * n / total
+        self._m2 += chunk_m2 + delta ** 2 * self._count * n / total
+        self._count = total
+        self._min = min(self._min, np.min(rr))
+        self._max = max(self._max, np.max(rr))
+
+        if self._last_rr is not None:
+            rr = np.concatenate(([self._last_rr], rr))
+        successive_diff = np.diff(rr)
+        self._diff_count += successive_diff.size
+        self._diff_sumsq += np.sum(successive_diff ** 2)
+        self._nn50 += np.count_nonzero(np.abs(successive_diff) * 1_000 > 50)
+        self._last_rr = rr[-1]
+
+    def get_peak_times(self):
+        """Return the times of the recently detected R-peaks."""
+        return np.asarray(self.recent_peaks, dtype=float) / self.fs
+
+    def get_rr_intervals(self):
+        """Return the recently computed RR intervals in seconds."""
+        return np.asarray(self.recent_rr, dtype=float)
+
+    def calculate_mean_rr(self):
+        """Return the running mean RR interval."""
+        return self._mean
+
+    def calculate_sdnn(self):
+        """Return the running standard deviation of RR intervals (SDNN)."""
+        return np.sqrt(self._m2 / self._count)
+
+    def calculate_rmssd(self):
+        """Return the running root mean square of successive differences (RMSSD)."""
+        return np.sqrt(self._diff_sumsq / self._diff_count) if self._diff_count else np.nan
+
+    def calculate_pnn50(self):
+        """Return the running percentage of RR intervals differing by more than 50 ms."""
+        return (self._nn50 / self._count) * 100
+
+    def summarize_hrv(self, bins=10, threshold=3):
+        """Return the running HRV summary in the same layout as HRV_analysis.summarize_hrv."""
+        if self._count == 0:
+            raise ValueError("RR intervals are not available. Stream at least two R-peaks first.")
+
+        # Outliers and the histogram are computed over the recent history only
+        recent = self.get_rr_intervals()
+        outliers = recent[np.abs(recent - self._mean) > threshold * self.calculate_sdnn()]
+        hist, bin_edges = np.histogram(recent, bins=bins)
+
+        summary = {
+            "Mean RR Interval (ms)": round(self.calculate_mean_rr() * 1_000, 2),
+            "SDNN (ms)": round(self.calculate_sdnn() * 1_000, 2),
+            "RMSSD (ms)": round(self.calculate_rmssd() * 1_000, 2),
+            "pNN50 (%)": round(self.calculate_pnn50(), 2),
+            "Min RR Interval (ms)": round(self._min * 1_000),
+            "Max RR Interval (ms)": round(self._max * 1_000),
+            "Range RR Interval (ms)": round((self._max - self._min) * 1_000),
+            "Outliers (ms)": [round(x * 1_000) for x in outliers],
+            "Histogram": (hist.tolist(), [round(edge * 1_000) for edge in bin_edges])
+        }
+        return summary, format_hrv_summary(summary)
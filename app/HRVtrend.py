@@ -0,0 +1,202 @@
+"""
+Rolling HRV trends: mean RR, SDNN, RMSSD, pNN50 and min/max RR over sliding time windows.
+
+Every window statistic comes from running sums (of RR, RR^2, squared successive differences and
+NN50 counts) and min/max from monotonic deques, so each window costs O(1) however long it is.
+`hrv_trends` computes all windows of a recorded series at once; `HRV_trend` is the incremental
+form for beats arriving one at a time.
+
+Windows cover the beats with time in [end - window, end]; each RR interval is placed at the beat
+that ends it. Intervals are in seconds and pNN50 in percent, with the definitions of HRV_analysis.
+"""
+from collections import deque
+
+import numpy as np
+
+# One row per window; `time` is the end of the window
+TREND_DTYPE = np.dtype([
+    ("time", np.float64),
+    ("n_intervals", np.int64),
+    ("mean_rr", np.float64),
+    ("sdnn", np.float64),
+    ("rmssd", np.float64),
+    ("pnn50", np.float64),
+    ("min_rr", np.float64),
+    ("max_rr", np.float64),
+])
+
+
+def sliding_extrema(values, first, last):
+    """
+    Min and max of values[first[i]:last[i]] for windows whose bounds never move backwards.
+
+    Each value enters and leaves the monotonic deques once, so the cost is O(len(values) + windows).
+    Empty windows get NaN.
+    """
+    minima = np.full(len(first), np.nan)
+    maxima = np.full(len(first), np.nan)
+    low, high = deque(), deque()  # Indices with increasing / decreasing values
+    end = 0
+    for i, (start, stop) in enumerate(zip(first.tolist(), last.tolist())):
+        while end < stop:
+            value = values[end]
+            while low and values[low[-1]] >= value:
+                low.pop()
+            while high and values[high[-1]] <= value:
+                high.pop()
+            low.append(end)
+            high.append(end)
+            end += 1
+        while low and low[0] < start:
+            low.popleft()
+        while high and high[0] < start:
+            high.popleft()
+        if low:
+            minima[i] = values[low[0]]
+            maxima[i] = values[high[0]]
+    return minima, maxima
+
+
+def _prefix(values):
+    prefix = np.zeros(len(values) + 1)
+    np.cumsum(values, out=prefix[1:])
+    return prefix
+
+
+def rr_times(peak_times, rr_intervals):
+    """
+    Time of every RR interval: the beat that ends it. `peak_times` may hold more beats than the
+    intervals need (e.g. a live history); the intervals are taken to end at the last beats.
+    """
+    peak_times = np.asarray(peak_times, dtype=float)
+    return peak_times[peak_times.size - len(rr_intervals):]
+
+
+def hrv_trends(peak_times, rr_intervals=None, window=300, step=30):
+    """
+    Return the TREND_DTYPE rows of every `window`-second window of the RR series, `step` seconds apart.
+
+    The first window ends `window` seconds after the first beat and the last one at or before the last beat.
+    """
+    peak_times = np.asarray(peak_times, dtype=float)
+    if rr_intervals is None:
+        rr_intervals = np.diff(peak_times)
+    rr = np.asarray(rr_intervals, dtype=float)
+    times = peak_times[1:]
+    if rr.size == 0 or times[-1] - peak_times[0] < window:
+        return np.zeros(0, dtype=TREND_DTYPE)
+
+    ends = np.arange(peak_times[0] + window, times[-1] + 1e-9, step)
+    first = np.searchsorted(times, ends - window, side="left")
+    last = np.searchsorted(times, ends, side="right")
+    counts = last - first
+
+    # Sums are taken around the first interval so that the variance does not cancel catastrophically
+    shift = rr[0]
+    sums = _prefix(rr - shift)
+    squares = _prefix((rr - shift) ** 2)
+    successive_diff = np.diff(rr)
+    diff_squares = _prefix(successive_diff ** 2)
+    nn50 = _prefix(np.abs(successive_diff) > 0.05)
+
+    trend = np.zeros(ends.size, dtype=TREND_DTYPE)
+    trend["time"] = ends
+    trend["n_intervals"] = counts
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (sums[last] - sums[first]) / counts
+        variance = (squares[last] - squares[first]) / counts - mean ** 2
+        trend["mean_rr"] = shift + mean
+        trend["sdnn"] = np.sqrt(np.maximum(variance, 0))
+        # Successive differences with both intervals in the window: indices first .. last - 2
+        n_diffs = np.maximum(counts - 1, 0)
+        diff_last = first + n_diffs
+        trend["rmssd"] = np.sqrt((diff_squares[diff_last] - diff_squares[first]) / n_diffs)
+        trend["pnn50"] = (nn50[diff_last] - nn50[first]) / counts * 100
+    trend["min_rr"], trend["max_rr"] = sliding_extrema(rr, first, last)
+    return trend
+
+
+class HRV_trend:
+    """
+    Incremental rolling HRV statistics for beats arriving one at a time.
+
+    `push(peak_time)` adds a beat and returns the trend rows of the windows that it completes. Each
+    beat enters and leaves the running sums and min/max deques once, so a push costs O(1) amortised.
+    """
+
+    def __init__(self, window=300, step=30):
+        self.window = window
+        self.step = step
+        self.reset()
+
+    def reset(self):
+        self._last_peak = None
+        self._next_end = None
+        self._beats = deque()  # (time, rr) inside the current window
+        self._low = deque()  # Beats with increasing RR, for the minimum
+        self._high = deque()  # Beats with decreasing RR, for the maximum
+        self._shift = None
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._diff_sumsq = 0.0
+        self._nn50 = 0
+
+    def push(self, peak_time):
+        """Add the beat at `peak_time` (s); return the TREND_DTYPE rows of the windows it completes."""
+        rows = []
+        if self._last_peak is None:
+            self._last_peak = peak_time
+            self._next_end = peak_time + self.window
+            return np.zeros(0, dtype=TREND_DTYPE)
+
+        # Windows ending before this beat are complete
+        while self._next_end < peak_time:
+            self._evict(self._next_end - self.window)
+            rows.append(self._row(self._next_end))
+            self._next_end += self.step
+
+        rr = peak_time - self._last_peak
+        self._last_peak = peak_time
+        self._add(peak_time, rr)
+        return np.array(rows, dtype=TREND_DTYPE) if rows else np.zeros(0, dtype=TREND_DTYPE)
+
+    def _add(self, time, rr):
+        if self._shift is None:
+            self._shift = rr
+        if self._beats:
+            diff = rr - self._beats[-1][1]
+            self._diff_sumsq += diff ** 2
+            self._nn50 += abs(diff) > 0.05
+        self._beats.append((time, rr))
+        self._sum += rr - self._shift
+        self._sumsq += (rr - self._shift) ** 2
+
+        while self._low and self._low[-1][1] >= rr:
+            self._low.pop()
+        while self._high and self._high[-1][1] <= rr:
+            self._high.pop()
+        self._low.append((time, rr))
+        self._high.append((time, rr))
+
+    def _evict(self, start):
+        while self._beats and self._beats[0][0] < start:
+            _, rr = self._beats.popleft()
+            self._sum -= rr - self._shift
+            self._sumsq -= (rr - self._shift) ** 2
+            if self._beats:
+                diff = self._beats[0][1] - rr
+                self._diff_sumsq -= diff ** 2
+                self._nn50 -= abs(diff) > 0.05
+        while self._low and self._low[0][0] < start:
+            self._low.popleft()
+        while self._high and self._high[0][0] < start:
+            self._high.popleft()
+
+    def _row(self, end):
+        n = len(self._beats)
+        if not n:
+            return (end, 0, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan)
+        mean = self._sum / n
+        rmssd = np.sqrt(max(self._diff_sumsq, 0.0) / (n - 1)) if n > 1 else np.nan
+        return (end, n, self._shift + mean, np.sqrt(max(self._sumsq / n - mean ** 2, 0.0)), rmssd,
+                self._nn50 / n * 100, self._low[0][1], self._high[0][1])
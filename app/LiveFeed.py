@@ -0,0 +1,421 @@
+"""
+Live device input: fixed-size ring buffers, stream sources and incremental analysis.
+
+Sources return the rows (time first, then the signal columns) that arrived since the last call to
+`read()` without blocking, so they can be polled from a GUI timer:
+
+    ReplaySource(csv)             replays a recording at its own pace (or `speed` times faster)
+    SocketSource(host, port)      reads newline-separated CSV rows from a TCP device or gateway
+
+LiveCTG and LiveECG keep the latest `capacity` samples of every signal and output in RingBuffers
+and update them from the new samples only, so memory and work per update stay constant however
+long the session runs.
+
+For testing without a device, replay a recording over TCP and connect to it from the app with
+tcp://localhost:5555:
+
+    python -m app.LiveFeed static/datasets/FHR/FHR_UC_Time.csv --port 5555 --speed 10
+"""
+import argparse
+import io
+import socket
+import sys
+import time as clock
+from collections import deque
+
+import numpy as np
+from scipy.signal import savgol_coeffs
+
+from app.CTGanalysis import ACCEL, DECEL, EPISODE_DTYPE
+from app.DataLoader import load_columns
+from app.HRVstream import HRV_stream
+from app.HRVtrend import HRV_trend, TREND_DTYPE
+
+
+class RingBuffer:
+    """
+    The latest `capacity` values of a stream in a preallocated array.
+
+    Every value is stored twice, at its position and one capacity further, so `view()` always
+    returns the latest values in order as a zero-copy slice. A view is only valid until the next
+    `extend`.
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+        self._end = 0  # Next write position, in [0, capacity)
+        self.total = 0  # Values written since the last clear
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def clear(self):
+        self._end = 0
+        self.total = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype).ravel()
+        self.total += values.size
+        if values.size > self.capacity:
+            self._end = (self._end + values.size - self.capacity) % self.capacity
+            values = values[-self.capacity:]
+
+        capacity, end = self.capacity, self._end
+        first = min(values.size, capacity - end)
+        self._data[end:end + first] = values[:first]
+        self._data[end + capacity:end + capacity + first] = values[:first]
+        rest = values.size - first
+        if rest:
+            self._data[:rest] = values[first:]
+            self._data[capacity:capacity + rest] = values[first:]
+        self._end = (end + values.size) % capacity
+
+    def view(self, n=None):
+        """The latest `n` values (all when None), oldest first, as a read-only view."""
+        n = len(self) if n is None else min(n, len(self))
+        stop = self._end + self.capacity
+        view = self._data[stop - n:stop]
+        view.flags.writeable = False
+        return view
+
+    def last(self):
+        return self._data[self._end + self.capacity - 1] if self.total else None
+
+
+class ReplaySource:
+    """
+    Replay a CSV recording as if it came from a device.
+
+    Each `read()` returns the rows whose time (first column, seconds) has been reached since the
+    replay started, `speed` times faster than real time. With `loop` the recording starts over,
+    with its times shifted, when it ends. `fs` is the sampling frequency of the recording.
+    """
+
+    def __init__(self, filepath, speed=1.0, loop=True):
+        columns = load_columns(filepath)
+        self.names = list(columns)
+        self.rows = np.column_stack([np.asarray(column, dtype=float) for column in columns.values()])
+        if self.rows.shape[0] < 2:
+            raise ValueError(f"{filepath} is too short to replay")
+        times = self.rows[:, 0]
+        self.fs = (times.size - 1) / (times[-1] - times[0])
+        self.period = times[-1] - times[0] + 1 / self.fs
+        self.speed = speed
+        self.loop = loop
+        self.rewind()
+
+    @property
+    def position(self):
+        """Rows of the current pass read so far; equals len(rows) once a replay without loop has ended."""
+        return self._cursor
+
+    def rewind(self):
+        """Start the replay over from the first row, with its original times."""
+        self._cursor = 0
+        self._offset = 0.0  # Added to the times of the current pass
+        self._started = None
+
+    def read(self):
+        now = clock.monotonic()
+        if self._started is None:
+            self._started = now
+        times = self.rows[:, 0]
+        target = times[0] + (now - self._started) * self.speed
+
+        parts = []
+        while True:
+            stop = int(np.searchsorted(times, target - self._offset, side="right"))
+            if stop > self._cursor:
+                part = self.rows[self._cursor:stop].copy()
+                part[:, 0] += self._offset
+                parts.append(part)
+                self._cursor = stop
+            if stop < times.size or not self.loop:
+                break
+            self._offset += self.period
+            self._cursor = 0
+        return np.concatenate(parts) if parts else np.empty((0, self.rows.shape[1]))
+
+    def close(self):
+        pass
+
+
+class SocketSource:
+    """
+    Read newline-separated CSV rows ("time,value,...") from a TCP stream.
+
+    The socket is non-blocking; `read()` parses the complete lines received so far (at most
+    `max_bytes` per call, so a backlog cannot stall the caller) and keeps a partial last line for
+    the next call. Lines that are not numeric, such as a header, are skipped. Raises
+    ConnectionError when the peer closes the stream. The stream does not tell its sampling
+    frequency, so `fs` is None.
+    """
+
+    fs = None
+
+    def __init__(self, host, port, max_bytes=1 << 20, timeout=5.0):
+        self.socket = socket.create_connection((host, port), timeout=timeout)
+        self.socket.setblocking(False)
+        self.max_bytes = max_bytes
+        self._pending = b""
+        self._width = None
+
+    def read(self):
+        received = []
+        size = 0
+        while size < self.max_bytes:
+            try:
+                block = self.socket.recv(min(1 << 16, self.max_bytes - size))
+            except BlockingIOError:
+                break
+            if not block:
+                if not received:
+                    raise ConnectionError("Device stream closed")
+                break
+            received.append(block)
+            size += len(block)
+
+        data = self._pending + b"".join(received)
+        complete, _, self._pending = data.rpartition(b"\n")
+        lines = [line for line in complete.split(b"\n") if line.strip() and _is_numeric(line)]
+        if not lines:
+            return np.empty((0, self._width or 0))
+        rows = np.loadtxt(io.BytesIO(b"\n".join(lines)), delimiter=",", ndmin=2)
+        self._width = rows.shape[1]
+        return rows
+
+    def close(self):
+        self.socket.close()
+
+
+def _is_numeric(line):
+    first = line.lstrip()[:1]
+    return first.isdigit() or first in (b"-", b"+", b".")
+
+
+def open_source(spec, speed=1.0):
+    """Open "tcp://host:port" as a SocketSource and anything else as a ReplaySource of that file."""
+    if spec.startswith("tcp://"):
+        host, _, port = spec[len("tcp://"):].rpartition(":")
+        return SocketSource(host or "localhost", int(port))
+    return ReplaySource(spec, speed=speed)
+
+
+class LiveCTG:
+    """
+    Incremental CTG analysis of Time, FHR and UC rows.
+
+    Produces the outputs of CTG_analysis with the same parameters as new rows arrive: the
+    Savitzky-Golay baseline (final once `window_length // 2` later samples are in), STV, the
+    accel/decel state of every sample and the episodes. The first and last `window_length // 2`
+    samples have no baseline, where the offline analysis extrapolates one.
+    """
+
+    def __init__(self, capacity=4 * 3600, window_length=15, polyorder=2, threshold=0.1, duration=3,
+                 max_episodes=1_000):
+        self.window_length = window_length
+        self.threshold = threshold
+        self.duration = duration
+        self.coefficients = savgol_coeffs(window_length, polyorder)
+
+        self.time = RingBuffer(capacity)
+        self.fhr = RingBuffer(capacity)
+        self.uc = RingBuffer(capacity)
+        self.stv = RingBuffer(capacity)  # Belongs to time[1:], like CTG_analysis.get_stv_times
+        self.stv_time = RingBuffer(capacity)
+        self.baseline_fhr = RingBuffer(capacity)
+        self.baseline_time = RingBuffer(capacity)
+        # Accel/decel state (ACCEL, DECEL or 0) of every sample that has enough neighbours
+        self.state = RingBuffer(capacity, dtype=np.int8)
+        self.state_time = RingBuffer(capacity)
+        self.state_fhr = RingBuffer(capacity)
+        self.recent_episodes = deque(maxlen=max_episodes)
+        self.reset()
+
+    def reset(self):
+        for buffer in (self.time, self.fhr, self.uc, self.stv, self.stv_time, self.baseline_fhr,
+                       self.baseline_time, self.state, self.state_time, self.state_fhr):
+            buffer.clear()
+        self.recent_episodes.clear()
+        self.samples_seen = 0
+        # Trailing raw samples needed as context by the next update
+        context = max(self.window_length, 2 * self.duration)
+        self._context_time = RingBuffer(context)
+        self._context_fhr = RingBuffer(context)
+        self._episode = None  # [kind, start, peak, start time, last index, last time] of the open episode
+
+    def push(self, rows):
+        """Add rows of (time, FHR, UC); returns the number of new samples."""
+        rows = np.asarray(rows, dtype=float)
+        if rows.size == 0:
+            return 0
+        time, fhr = rows[:, 0], rows[:, 1]
+        uc = rows[:, 2] if rows.shape[1] > 2 else np.full(time.size, np.nan)
+        start = self.samples_seen  # Absolute index of the first new sample
+
+        context_time = np.concatenate((self._context_time.view(), time))
+        context_fhr = np.concatenate((self._context_fhr.view(), fhr))
+        context_start = start - len(self._context_fhr)
+
+        # STV needs the previous sample
+        if start > 0:
+            self.stv.extend(np.abs(np.diff(context_fhr[-fhr.size - 1:])))
+            self.stv_time.extend(time)
+        elif fhr.size > 1:
+            self.stv.extend(np.abs(np.diff(fhr)))
+            self.stv_time.extend(time[1:])
+
+        self._update_baseline(context_time, context_fhr, context_start, start)
+        self._update_state(context_time, context_fhr, context_start, start)
+
+        self.time.extend(time)
+        self.fhr.extend(fhr)
+        self.uc.extend(uc)
+        self._context_time.extend(time)
+        self._context_fhr.extend(fhr)
+        self.samples_seen += fhr.size
+        return fhr.size
+
+    def _update_baseline(self, context_time, context_fhr, context_start, start):
+        """Baseline of the samples whose smoothing window was completed by this update."""
+        half = self.window_length // 2
+        if context_fhr.size < self.window_length:
+            return
+        smoothed = np.convolve(context_fhr, self.coefficients, mode='valid')
+        # Output j is centred on context sample j + half; keep the ones not emitted before
+        first_new = max(0, start - context_start - 2 * half)
+        self.baseline_fhr.extend(smoothed[first_new:])
+        self.baseline_time.extend(context_time[first_new + half:first_new + half + smoothed.size - first_new])
+
+    def _update_state(self, context_time, context_fhr, context_start, start):
+        """Accel/decel state of the samples whose change window was completed, and their episodes."""
+        d = self.duration
+        if context_fhr.size < 2 * d:
+            return
+        averages = np.convolve(context_fhr, np.ones(d) / d, mode='valid')
+        change = averages[d:] - averages[:-d]
+        # Output j belongs to context sample j + d // 2, as in fhr_change
+        first_new = max(0, start - context_start - 2 * d + 1)
+        change = change[first_new:]
+        if change.size == 0:
+            return
+        samples = np.arange(change.size) + first_new + d // 2
+        state = np.zeros(change.size, dtype=np.int8)
+        state[change <= -self.threshold] = DECEL
+        state[change >= self.threshold] = ACCEL  # Acceleration wins, as in identify_accel_decel
+
+        self.state.extend(state)
+        self.state_time.extend(context_time[samples])
+        self.state_fhr.extend(context_fhr[samples])
+        self._update_episodes(state, change, samples + context_start, context_time[samples])
+
+    def _update_episodes(self, state, change, indices, times):
+        episode = self._episode
+        for kind, value, index, time in zip(state.tolist(), change.tolist(), indices.tolist(), times.tolist()):
+            if episode is not None and kind != episode[0]:
+                self._close_episode(episode)
+                episode = None
+            if kind == 0:
+                continue
+            if episode is None:
+                episode = [kind, index, value * kind, time, index, time]
+            else:
+                episode[2] = max(episode[2], value * kind)
+                episode[4], episode[5] = index, time
+        self._episode = episode
+
+    def _close_episode(self, episode):
+        kind, start, peak, start_time, end, end_time = episode
+        self.recent_episodes.append((kind, start, end, peak * kind, end - start + 1, end_time - start_time))
+
+    def episodes(self):
+        """The recent closed episodes as an EPISODE_DTYPE array (the open one, if any, is not included)."""
+        return np.array(list(self.recent_episodes), dtype=EPISODE_DTYPE)
+
+    def accel_decel(self):
+        """(time, fhr) of the recent acceleration samples and of the recent deceleration samples."""
+        state = self.state.view()
+        time = self.state_time.view()
+        fhr = self.state_fhr.view()
+        accel, decel = state == ACCEL, state == DECEL
+        return (time[accel], fhr[accel]), (time[decel], fhr[decel])
+
+
+class LiveECG:
+    """
+    Incremental HRV analysis of Time, ECG rows, built on HRV_stream and HRV_trend.
+
+    Keeps the latest `capacity` raw samples (by default 30 s at `fs`) and `max_beats` beats for
+    display.
+    """
+
+    def __init__(self, fs=500, capacity=None, max_beats=4096, trend_window=300, trend_step=30):
+        self.fs = fs
+        capacity = capacity or int(30 * fs)
+        self.stream = HRV_stream(fs=fs, history=max_beats)
+        self.trend = HRV_trend(trend_window, trend_step)
+        self.time = RingBuffer(capacity)
+        self.ecg = RingBuffer(capacity)
+        self.recent_trend = deque(maxlen=max_beats)
+
+    def push(self, rows):
+        """Add rows of (time, ECG); returns the number of newly confirmed beats."""
+        rows = np.asarray(rows, dtype=float)
+        if rows.size == 0:
+            return 0
+        self.time.extend(rows[:, 0])
+        self.ecg.extend(rows[:, 1])
+        peaks = self.stream.process_chunk(rows[:, 1])
+        for peak_time in (peaks / self.fs).tolist():
+            self.recent_trend.extend(self.trend.push(peak_time).tolist())
+        return peaks.size
+
+    def trends(self):
+        return np.array(list(self.recent_trend), dtype=TREND_DTYPE)
+
+
+def serve_replay(filepath, host="localhost", port=5555, speed=1.0, loop=True, interval=0.05):
+    """Stream a recording as CSV lines to every client that connects, at `speed` times real time."""
+    server = socket.create_server((host, port))
+    print(f"Replaying {filepath} on tcp://{host}:{port}")
+    try:
+        while True:
+            connection, address = server.accept()
+            print(f"Client {address[0]}:{address[1]} connected")
+            source = ReplaySource(filepath, speed=speed, loop=loop)
+            try:
+                with connection:
+                    connection.sendall((",".join(source.names) + "\n").encode())
+                    while True:
+                        rows = source.read()
+                        if rows.size:
+                            text = io.StringIO()
+                            np.savetxt(text, rows, delimiter=",", fmt="%.6g")
+                            connection.sendall(text.getvalue().encode())
+                        elif not loop and source.position >= source.rows.shape[0]:
+                            break
+                        clock.sleep(interval)
+            except (BrokenPipeError, ConnectionResetError):
+                print("Client disconnected")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.LiveFeed",
+                                     description="Replay a recording over TCP as a simulated device.")
+    parser.add_argument("file", help="CSV recording (Time, FHR, UC or Time, ECG).")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed relative to real time.")
+    parser.add_argument("--once", action="store_true", help="Stop at the end of the recording instead of looping.")
+    args = parser.parse_args(argv)
+    serve_replay(args.file, args.host, args.port, args.speed, loop=not args.once)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+R-peak detectors for HRV_analysis.
+
+A detector takes a band-passed ECG and its sampling frequency and returns the sample indices of
+the R-peaks:
+
+    detector = PanTompkinsDetector()
+    peaks = detector.detect(filtered_ecg, fs)
+
+Detectors are registered in DETECTORS by name so that the analysis classes and command-line
+tools can select one with a string.
+"""
+import numpy as np
+from scipy.signal import find_peaks
+
+from app.FilterEngine import filter_signal
+
+
+class PeakDetector:
+    """Base class of the R-peak detectors."""
+
+    name = None
+
+    def detect(self, signal, fs):
+        """Return the R-peak sample indices (int64, increasing) of `signal` sampled at `fs` Hz."""
+        raise NotImplementedError
+
+
+class ThresholdDetector(PeakDetector):
+    """
+    Every local maximum above the mean of the signal.
+
+    This is the original HRV_analysis heuristic. It has no refractory period, so T-waves and noise
+    spikes are counted as beats; it is kept for comparison with earlier results.
+    """
+
+    name = "threshold"
+
+    def detect(self, signal, fs):
+        peaks, _ = find_peaks(signal, height=np.mean(signal))
+        return peaks.astype(np.int64)
+
+
+class PanTompkinsDetector(PeakDetector):
+    """
+    Pan-Tompkins QRS detection.
+
+    The signal is band-passed to the QRS band, differentiated, squared and integrated over a moving
+    window; the local maxima of the integrated signal at least one refractory period apart are the
+    QRS candidates. All of this is done with whole-array NumPy operations. Only the candidates (a
+    few per second) go through the adaptive signal/noise thresholds, T-wave rejection and
+    search-back, and the R-peak is then located in the input signal around each accepted candidate.
+
+    Times are in seconds and converted to samples with the `fs` passed to `detect`.
+    """
+
+    name = "pan_tompkins"
+
+    def __init__(self, lowcut=5, highcut=15, order=2, integration_window=0.15, refractory=0.2,
+                 t_wave_window=0.36, learning_period=2.0):
+        self.lowcut = lowcut
+        self.highcut = highcut
+        self.order = order
+        self.integration_window = integration_window
+        self.refractory = refractory
+        self.t_wave_window = t_wave_window
+        self.learning_period = learning_period
+
+    def integrate(self, signal, fs):
+        """Return (moving-window integration, derivative) of the QRS-band signal."""
+        band = filter_signal(signal, fs, self.lowcut, self.highcut, self.order)
+
+        # Five-point derivative, (2x[n+1] + x[n+2] - x[n-2] - 2x[n-1]) * fs / 8
+        derivative = np.convolve(band, np.array([1, 2, 0, -2, -1]) * (fs / 8), mode='same')
+        del band
+
+        squared = np.square(derivative)
+        window = max(1, int(round(self.integration_window * fs)))
+        # Centred moving average from a cumulative sum: O(1) per sample whatever the window
+        cumulative = np.zeros(squared.size + 1)
+        np.cumsum(squared, out=cumulative[1:])
+        del squared
+        # sums[k] covers squared[k:k + window] and is centred on sample k + window // 2
+        sums = cumulative[window:] - cumulative[:-window]
+        del cumulative
+        sums /= window
+        integrated = np.empty(derivative.size)
+        start = window // 2
+        integrated[start:start + sums.size] = sums
+        integrated[:start] = sums[0]
+        integrated[start + sums.size:] = sums[-1]
+        return integrated, derivative
+
+    def detect(self, signal, fs):
+        signal = np.asarray(signal, dtype=float)
+        if signal.size < 3 * max(1, int(fs * self.integration_window)):
+            return np.empty(0, dtype=np.int64)
+
+        integrated, derivative = self.integrate(signal, fs)
+        refractory = max(1, int(round(self.refractory * fs)))
+        candidates, _ = find_peaks(integrated, distance=refractory)
+        if candidates.size == 0:
+            return np.empty(0, dtype=np.int64)
+        heights = integrated[candidates]
+
+        # Steepest slope just before every candidate, for telling T-waves from QRS complexes
+        slope_window = max(1, int(round(self.integration_window / 2 * fs)))
+        slopes = _window_max(np.abs(derivative), candidates, slope_window, 0)
+
+        learning = integrated[:max(1, int(self.learning_period * fs))]
+        qrs = self._classify(candidates, heights, slopes, fs, signal_level=np.max(learning) / 3,
+                             noise_level=np.mean(learning) / 2)
+        if qrs.size == 0:
+            return qrs
+
+        # The R-peak is the tallest sample of the input within half an integration window
+        half = max(1, int(round(self.integration_window / 2 * fs)))
+        offsets = _window_argmax(signal, qrs, half, half)
+        peaks = np.unique(qrs + offsets)
+        return peaks.astype(np.int64)
+
+    def _classify(self, candidates, heights, slopes, fs, signal_level, noise_level):
+        """Run the adaptive Pan-Tompkins thresholds over the candidates; return the QRS candidates."""
+        t_wave = self.t_wave_window * fs
+        accepted = []
+        rr_history = []
+        last_qrs = None
+        last_slope = None
+        skipped = []  # (index, height, slope) of candidates rejected since the last QRS
+
+        for index, height, slope in zip(candidates.tolist(), heights.tolist(), slopes.tolist()):
+            threshold = noise_level + 0.25 * (signal_level - noise_level)
+
+            # Search back for a beat missed since the last QRS when this gap is unusually long
+            if last_qrs is not None and len(rr_history) >= 2 and skipped:
+                mean_rr = sum(rr_history) / len(rr_history)
+                if index - last_qrs > 1.66 * mean_rr:
+                    missed = max(skipped, key=lambda item: item[1])
+                    if missed[1] > 0.5 * threshold:
+                        rr_history = (rr_history + [missed[0] - last_qrs])[-8:]
+                        accepted.append(missed[0])
+                        last_qrs, last_slope = missed[0], missed[2]
+                        signal_level = 0.25 * missed[1] + 0.75 * signal_level
+                        threshold = noise_level + 0.25 * (signal_level - noise_level)
+                    skipped = []
+
+            is_qrs = height > threshold
+            if is_qrs and last_qrs is not None and index - last_qrs < t_wave and slope < 0.5 * last_slope:
+                is_qrs = False  # Shallow wave shortly after a beat: a T-wave
+
+            if is_qrs:
+                if last_qrs is not None:
+                    rr_history = (rr_history + [index - last_qrs])[-8:]
+                accepted.append(index)
+                last_qrs, last_slope = index, slope
+                signal_level = 0.125 * height + 0.875 * signal_level
+                skipped = []
+            else:
+                noise_level = 0.125 * height + 0.875 * noise_level
+                skipped.append((index, height, slope))
+
+        return np.asarray(accepted, dtype=np.int64)
+
+
+def _gather(values, indices, before, after):
+    """values[i - before : i + after + 1] for every index i, clipped at the ends, as rows of a 2-D array."""
+    offsets = np.arange(-before, after + 1)
+    return values[np.clip(indices[:, np.newaxis] + offsets, 0, values.size - 1)], offsets
+
+
+def _window_max(values, indices, before, after):
+    rows, _ = _gather(values, indices, before, after)
+    return rows.max(axis=1)
+
+
+def _window_argmax(values, indices, before, after):
+    """Offset of the maximum of `values` around every index (relative to the index)."""
+    rows, offsets = _gather(values, indices, before, after)
+    offset = offsets[np.argmax(rows, axis=1)]
+    # Keep clipped windows at the ends of the signal inside it
+    return np.clip(indices + offset, 0, values.size - 1) - indices
+
+
+DETECTORS = {
+    PanTompkinsDetector.name: PanTompkinsDetector,
+    ThresholdDetector.name: ThresholdDetector,
+}
+
+
+def get_detector(detector=None):
+    """Return a detector instance from an instance, a registered name, or None for the default (Pan-Tompkins)."""
+    if detector is None:
+        return PanTompkinsDetector()
+    if isinstance(detector, PeakDetector):
+        return detector
+    try:
+        return DETECTORS[detector]()
+    except KeyError:
+        raise ValueError(f"Unknown R-peak detector {detector!r}; choose from {', '.join(DETECTORS)}") from None
@@ -0,0 +1,164 @@
+"""
+Load-and-analyse pipelines behind the Upload Signal button.
+
+These functions only compute; they do not touch Qt, so they can run on a worker thread and hand
+their result back to the GUI thread for plotting. Each takes an optional `report(percent, stage)`
+callback that is called between stages (and may raise to cancel the pipeline), and an optional
+ResultCache: a recording analysed before with the same parameters is then served from disk.
+"""
+import tempfile
+
+import numpy as np
+
+from app.HRVanalysis import HRV_analysis, summary_from_json
+from app.DataLoader import load_ecg, load_ctg
+from app.CTGanalysis import CTG_analysis, CTG_result
+from app.Profiling import profiled
+
+# Recordings longer than this (e.g. Holter ECG) are analysed window by window
+LONG_RECORDING_SAMPLES = 5_000_000
+
+# Rolling HRV trend windows (s); recordings shorter than two windows get proportionally shorter ones
+TREND_WINDOW = 300
+TREND_STEP = 30
+
+# Bump when an analysis changes its output, so results cached by older versions are not reused
+RESULT_VERSION = 1
+
+# Parameters of the CTG stages, passed to CTG_analysis.analyze and part of the cache key
+CTG_PARAMETERS = {"window_length": 15, "polyorder": 2, "threshold": 0.1, "duration": 3}
+
+# Result fields stored in the ResultCache; the rest is reloaded or rebuilt
+ECG_CACHED_ARRAYS = ("filtered", "rr_intervals", "peak_times", "peaks", "trend")
+CTG_CACHED_ARRAYS = ("baseline_fhr", "time_stv", "stv", "accel_indices", "decel_indices", "episodes")
+
+
+def _no_report(percent, stage):
+    pass
+
+
+def ecg_parameters(analysis):
+    """Everything besides the recording that determines the output of analyze_ecg_file."""
+    return {
+        "pipeline": "ecg",
+        "version": RESULT_VERSION,
+        "fs": analysis.fs,
+        "filter": [1, 50, 5],
+        "detector": [analysis.detector.name, vars(analysis.detector)],
+        "windowed": len(analysis.data) > LONG_RECORDING_SAMPLES,
+        "trend": [TREND_WINDOW, TREND_STEP],
+    }
+
+
+def ctg_parameters():
+    """Everything besides the recording that determines the output of analyze_ctg_file."""
+    return {"pipeline": "ctg", "version": RESULT_VERSION, **CTG_PARAMETERS}
+
+
+def _cache_lookup(cache, filepath, params):
+    """Return (key, cached entry or None); both are None without a cache or when the file cannot be hashed."""
+    if cache is None:
+        return None, None
+    try:
+        key = cache.key(filepath, params)
+    except OSError:
+        return None, None
+    return key, cache.get(key)
+
+
+@profiled("analyze_ecg_file")
+def analyze_ecg_file(filepath, report=None, cache=None):
+    """
+    Load an ECG recording and run the HRV analysis; returns a dict of arrays for plotting. Without
+    enough R-peaks for HRV (e.g. a flat trace), "summary" is None and the signal is still returned.
+    """
+    report = report or _no_report
+
+    report(0, "Loading")
+    # First column holds the x-data and second column the y-data; reopened files come from the binary cache
+    x_data, y_data = load_ecg(filepath)
+
+    analysis = HRV_analysis(y_data)  # Initialize filtering with ECG data
+    key, cached = _cache_lookup(cache, filepath, ecg_parameters(analysis))
+    if cached is not None:
+        report(100, "Done (cached)")
+        arrays, values = cached
+        # Restore the analysis state so the result behaves like a fresh one
+        analysis.filtered_data = arrays["filtered"]
+        analysis.peaks = arrays["peaks"]
+        analysis.rr_intervals = arrays["rr_intervals"]
+        return {
+            "time": x_data,
+            "raw": y_data,
+            "filtered": arrays["filtered"],
+            "rr_intervals": arrays["rr_intervals"],
+            "peak_times": arrays["peak_times"],
+            "trend": arrays.get("trend"),
+            "summary": summary_from_json(values["summary"]),
+            "summary_text": values["summary_text"],
+            "analysis": analysis,
+        }
+
+    report(30, "Filtering")
+    if len(y_data) > LONG_RECORDING_SAMPLES:
+        # Filter in overlapping windows into a temporary memory-mapped file instead of holding a filtered copy in RAM
+        filtered_y_data = np.memmap(tempfile.TemporaryFile(), dtype=np.float64, mode='w+', shape=(len(y_data),))
+        rr_intervals = analysis.calculate_hrv_windowed(filtered_out=filtered_y_data)
+    else:
+        filtered_y_data = analysis.apply_filter()  # Filter the ECG data
+        report(60, "Detecting R-peaks")
+        rr_intervals = analysis.calculate_hrv()  # Calculate HRV data
+
+    report(80, "Summarizing")
+    try:
+        summary, summary_text = analysis.summarize_hrv()
+    except ValueError as e:  # e.g. a flat or noisy ECG without R-peaks; the signal is still plotted
+        summary, summary_text = None, f"HRV not available: {e}"
+
+    peak_times = analysis.get_peak_times()
+    duration = peak_times[-1] - peak_times[0] if len(peak_times) else 0
+    window = min(TREND_WINDOW, duration / 2)
+    trend = analysis.calculate_trends(window, min(TREND_STEP, window / 10)) if window > 0 else None
+
+    result = {
+        "time": x_data,
+        "raw": y_data,
+        "filtered": filtered_y_data,
+        "rr_intervals": rr_intervals,
+        "peak_times": peak_times,  # Peak times corresponding to the RR intervals
+        "trend": trend,  # Rolling HRV metrics, one row per window
+        "summary": summary,
+        "summary_text": summary_text,
+        "analysis": analysis,
+    }
+    if key is not None:
+        report(90, "Caching")
+        arrays = {name: result.get(name) for name in ECG_CACHED_ARRAYS}
+        arrays["peaks"] = analysis.peaks
+        cache.put(key, arrays, {"summary": summary, "summary_text": summary_text})
+
+    report(100, "Done")
+    return result
+
+
+@profiled("analyze_ctg_file")
+def analyze_ctg_file(filepath, report=None, cache=None):
+    """Load a Time/FHR/UC recording and run CTG_analysis on it; returns a CTG_result."""
+    report = report or _no_report
+
+    report(0, "Loading")
+    # Read CSV file, or its binary cache when it has been opened before
+    time, fhr, uc = load_ctg(filepath)
+
+    key, cached = _cache_lookup(cache, filepath, ctg_parameters())
+    if cached is not None:
+        report(100, "Done (cached)")
+        arrays, _ = cached
+        return CTG_result(time, fhr, uc, *(arrays.get(name) for name in CTG_CACHED_ARRAYS))
+
+    result = CTG_analysis(time, fhr, uc).analyze(report, **CTG_PARAMETERS)
+    if key is not None:
+        cache.put(key, {name: getattr(result, name) for name in CTG_CACHED_ARRAYS}, {})
+
+    report(100, "Done")
+    return result
@@ -0,0 +1,172 @@
+"""
+Opt-in stage timing for the load -> analyse -> plot path.
+
+Functions decorated with `profiled` record wall time, sample count and (optionally) the memory
+allocated while they run into the shared PROFILER. Profiling is off unless the BIORHYTHM_PROFILE
+environment variable is set ("1" for timings, "memory" to also trace allocations) or
+PROFILER.enable() is called; when off, a decorated call costs one attribute check.
+
+    PROFILER.enable()
+    ... upload a file ...
+    PROFILER.report()       # one dict per stage
+    PROFILER.log_report()   # one log line
+"""
+import functools
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class _Frame:
+    __slots__ = ("name", "samples", "started", "start_bytes", "peak_bytes")
+
+
+class Profiler:
+    def __init__(self, enabled=False, trace_memory=False, max_records=10_000):
+        self.enabled = False
+        self.trace_memory = False
+        self.records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if enabled:
+            self.enable(trace_memory)
+
+    def enable(self, trace_memory=False):
+        """Start recording stages; `trace_memory` also measures allocations with tracemalloc (slower)."""
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.trace_memory = False
+
+    def reset(self):
+        with self._lock:
+            self.records.clear()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start(self, name, samples=None):
+        stack = self._stack()
+        frame = _Frame()
+        frame.name = name
+        frame.samples = samples
+        frame.start_bytes = frame.peak_bytes = 0
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # Remember the enclosing stage's peak before resetting it for this one
+                stack[-1].peak_bytes = max(stack[-1].peak_bytes, peak)
+            tracemalloc.reset_peak()
+            frame.start_bytes = frame.peak_bytes = current
+        stack.append(frame)
+        frame.started = time.perf_counter()
+        return frame
+
+    def stop(self, frame):
+        seconds = time.perf_counter() - frame.started
+        stack = self._stack()
+        stack.pop()
+
+        allocated = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = max(frame.peak_bytes, tracemalloc.get_traced_memory()[1])
+            allocated = peak - frame.start_bytes
+            if stack:
+                stack[-1].peak_bytes = max(stack[-1].peak_bytes, peak)
+
+        record = {
+            "stage": frame.name,
+            "seconds": seconds,
+            "samples": frame.samples,
+            "allocated_bytes": allocated,
+            "depth": len(stack),
+            "thread": threading.current_thread().name,
+        }
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def report(self):
+        """Aggregate the records per stage, in first-seen order."""
+        stages = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            stage = stages.setdefault(record["stage"], {
+                "stage": record["stage"], "calls": 0, "seconds": 0.0, "samples": 0, "allocated_bytes": None,
+            })
+            stage["calls"] += 1
+            stage["seconds"] += record["seconds"]
+            stage["samples"] += record["samples"] or 0
+            if record["allocated_bytes"] is not None:
+                stage["allocated_bytes"] = max(stage["allocated_bytes"] or 0, record["allocated_bytes"])
+        return list(stages.values())
+
+    def summary_lines(self):
+        lines = []
+        for stage in self.report():
+            line = f"{stage['stage']:<32} {stage['seconds'] * 1_000:9.1f} ms"
+            if stage["samples"]:
+                line += f"  {stage['samples']:>11,d} samples"
+            if stage["allocated_bytes"] is not None:
+                line += f"  {stage['allocated_bytes'] / 2 ** 20:7.1f} MiB"
+            lines.append(line)
+        return lines
+
+    def log_report(self, level=logging.INFO):
+        """Log all stages on a single line."""
+        parts = []
+        for stage in self.report():
+            part = f"{stage['stage']} {stage['seconds'] * 1_000:.1f} ms"
+            if stage["samples"]:
+                part += f"/{stage['samples']} samples"
+            if stage["allocated_bytes"] is not None:
+                part += f"/{stage['allocated_bytes'] / 2 ** 20:.1f} MiB"
+            parts.append(part)
+        logger.log(level, "profile: %s", " | ".join(parts))
+
+
+_env = os.environ.get("BIORHYTHM_PROFILE", "").lower()
+PROFILER = Profiler(enabled=_env not in ("", "0", "false"), trace_memory=_env == "memory")
+
+
+def profiled(name=None, samples=None):
+    """
+    Record every call of the decorated function as a stage of PROFILER.
+
+    `samples` optionally computes the sample count as samples(result, *args, **kwargs).
+    """
+    def decorate(fn):
+        stage_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return fn(*args, **kwargs)
+
+            frame = PROFILER.start(stage_name)
+            try:
+                result = fn(*args, **kwargs)
+                if samples is not None:
+                    frame.samples = samples(result, *args, **kwargs)
+                return result
+            finally:
+                PROFILER.stop(frame)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,179 @@
+"""
+Persistent on-disk cache of analysis results.
+
+An entry is keyed on the content hash of the recording plus the analysis parameters (sampling
+frequency, filter band and order, detector settings, ...) and holds the result arrays as .npy
+files, which are memory-mapped on a hit, plus a JSON file for summaries and other plain values.
+The cache is bounded in bytes; when a new entry pushes it over the limit the least recently used
+entries are removed. Recency is the modification time of an entry's metadata file, which is
+touched on every hit, so several processes can share one cache directory.
+
+    cache = ResultCache()
+    key = cache.key(filepath, {"pipeline": "ecg", "fs": 500})
+    hit = cache.get(key)          # None or (arrays, values)
+    cache.put(key, arrays, values)
+
+The directory defaults to $BIORHYTHM_CACHE_DIR or ~/.cache/ctg-monitor/results.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from app.DataLoader import file_fingerprint
+
+DEFAULT_MAX_BYTES = 1 << 30
+META_FILE = "meta.json"
+HASH_INDEX_FILE = "hashes.json"
+MAX_INDEXED_FILES = 10_000  # Content hashes remembered; the least recently used are forgotten first
+
+
+def default_cache_dir():
+    return os.environ.get("BIORHYTHM_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "ctg-monitor", "results")
+
+
+class ResultCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hashes = None  # (path, size, mtime) -> content hash, so unchanged files are not re-read
+
+    def _hash_index_path(self):
+        return os.path.join(self.directory, HASH_INDEX_FILE)
+
+    def content_hash(self, filepath):
+        """
+        BLAKE2 hash of the file's bytes, remembered per (path, size, mtime) across sessions for the
+        MAX_INDEXED_FILES most recently used files.
+        """
+        stat = os.stat(filepath)
+        stamp = f"{os.path.abspath(filepath)}|{stat.st_size}|{stat.st_mtime_ns}"
+        with self._lock:
+            if self._hashes is None:
+                try:
+                    with open(self._hash_index_path()) as f:
+                        self._hashes = json.load(f)
+                except (OSError, ValueError):
+                    self._hashes = {}
+            digest = self._hashes.pop(stamp, None)
+            if digest is not None:
+                self._hashes[stamp] = digest  # Most recently used last
+        if digest is None:
+            digest = file_fingerprint(filepath, key="hash")["hash"]
+            prefix = stamp.rsplit("|", 2)[0] + "|"
+            with self._lock:
+                # Older versions of the same file will not be asked for again
+                for stale in [old for old in self._hashes if old.startswith(prefix)]:
+                    del self._hashes[stale]
+                self._hashes[stamp] = digest
+                for old in list(self._hashes)[:max(len(self._hashes) - MAX_INDEXED_FILES, 0)]:
+                    del self._hashes[old]
+                self._save_hashes()
+        return digest
+
+    def _save_hashes(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._hash_index_path() + ".tmp", "w") as f:
+                json.dump(self._hashes, f)
+            os.replace(self._hash_index_path() + ".tmp", self._hash_index_path())
+        except OSError as e:
+            print(f"Could not write result cache index: {e}")
+
+    def key(self, filepath, params):
+        """Return the entry key of `filepath` analysed with the JSON-serialisable `params`."""
+        payload = json.dumps({"content": self.content_hash(filepath), "params": params}, sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key, mmap_mode="r"):
+        """Return (arrays, values) stored under `key`, or None; arrays are memory-mapped read-only."""
+        entry = self._entry(key)
+        meta_path = os.path.join(entry, META_FILE)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(entry, name + ".npy"), mmap_mode=mmap_mode,
+                                    allow_pickle=False)
+                      for name in meta["arrays"]}
+            os.utime(meta_path)  # Mark as recently used
+        except (OSError, ValueError, KeyError):
+            return None
+        return arrays, meta["values"]
+
+    def put(self, key, arrays, values):
+        """
+        Store `arrays` (name -> ndarray, None entries are skipped) and the JSON-serialisable `values`
+        under `key`, then evict least recently used entries beyond `max_bytes`.
+        """
+        if sum(np.asarray(array).nbytes for array in arrays.values() if array is not None) > self.max_bytes:
+            return  # It would only evict everything else and then itself
+
+        entry = self._entry(key)
+        staging = entry + ".tmp"
+        try:
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            names = []
+            size = 0
+            for name, array in arrays.items():
+                if array is None:
+                    continue
+                path = os.path.join(staging, name + ".npy")
+                np.save(path, np.asarray(array), allow_pickle=False)
+                size += os.path.getsize(path)
+                names.append(name)
+            with open(os.path.join(staging, META_FILE), "w") as f:
+                json.dump({"arrays": names, "values": values, "bytes": size}, f)
+
+            # Publish the entry in one rename so readers never see a partial one
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(staging, entry)
+        except (OSError, TypeError, ValueError) as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            print(f"Could not write result cache entry: {e}")
+            return
+        self.evict()
+
+    def entries(self):
+        """Return [(last used, bytes, key)] of every complete entry, least recently used first."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith(".tmp"):
+                continue
+            meta_path = os.path.join(self.directory, name, META_FILE)
+            try:
+                with open(meta_path) as f:
+                    size = json.load(f).get("bytes", 0)
+                entries.append((os.stat(meta_path).st_mtime_ns, size, name))
+            except (OSError, ValueError):
+                continue
+        entries.sort()
+        return entries
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the cache holds at most `max_bytes`."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        self.evict(0)
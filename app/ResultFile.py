@@ -0,0 +1,277 @@
+"""
+Export and import of analysed recordings as one compact, chunked file.
+
+A result file is a compressed .npz (a zip of .npy members), so NumPy or any zip reader can open
+it. It holds tables of columns that share a sorted `time` column: the raw and filtered signal,
+R-peaks, RR intervals and the HRV trend of an ECG, or the FHR/UC/baseline signal, STV,
+accelerations, decelerations and episodes of a CTG, plus the summary metrics. Every column is
+split into chunks of `chunk_size` rows stored as separate members (`signal/raw/00003`), and each
+table keeps the time of its chunks' first rows, so reading a time range only decompresses the
+chunks it overlaps:
+
+    export_result("rec.npz", analyze_ecg_file("rec.csv"), source="rec.csv")
+    with ResultFile("rec.npz") as f:
+        part = f.read("signal", 120, 180, columns=["time", "raw"])
+    result = load_result("rec.npz")  # Plots like a fresh analyze_ecg_file/analyze_ctg_file result
+
+Loading a result file skips both the CSV parsing and the analysis.
+"""
+import json
+import os
+
+import numpy as np
+
+from app.HRVtrend import rr_times
+
+FORMAT = "ctg-monitor-result"
+FORMAT_VERSION = 2  # 2: RR intervals are stamped with the beat that ends them (1: the one that starts them)
+DEFAULT_CHUNK_SIZE = 65_536  # Rows per chunk: 512 KiB per float64 column
+
+RESULT_FILE_EXTENSION = ".npz"
+META_MEMBER = "meta"
+
+# Kinds of recording
+ECG = "ecg"
+CTG = "ctg"
+
+# Columns of the "signal" table of each kind, in the order of the pipeline results
+SIGNAL_COLUMNS = {
+    ECG: ["time", "raw", "filtered"],
+    CTG: ["time", "fhr", "uc", "baseline_fhr"],
+}
+
+
+def _no_report(percent, stage):
+    pass
+
+
+def _structured_columns(array):
+    """Columns of a structured array, by field name."""
+    return {name: array[name] for name in array.dtype.names}
+
+
+def ecg_tables(result):
+    """The tables of an analyze_ecg_file result as {table: {column: array}}."""
+    analysis = result["analysis"]
+    peak_times = np.asarray(result["peak_times"])
+    rr = np.asarray(result["rr_intervals"])
+    tables = {
+        "signal": {"time": result["time"], "raw": result["raw"], "filtered": result["filtered"]},
+        "beats": {"time": peak_times, "peak": analysis.peaks},
+        "rr": {"time": rr_times(peak_times, rr), "rr": rr},  # Each interval at the beat that ends it
+    }
+    if result.get("trend") is not None:
+        tables["trend"] = _structured_columns(result["trend"])
+    return tables
+
+
+def ctg_tables(result):
+    """The tables of a CTG_result as {table: {column: array}}."""
+    time = np.asarray(result.time)
+    episodes = _structured_columns(result.episodes)
+    return {
+        "signal": {"time": time, "fhr": result.fhr, "uc": result.uc, "baseline_fhr": result.baseline_fhr},
+        "stv": {"time": result.time_stv, "stv": result.stv},
+        "accel": {"time": time[result.accel_indices], "index": result.accel_indices},
+        "decel": {"time": time[result.decel_indices], "index": result.decel_indices},
+        "episodes": {"time": time[episodes["start"]], **episodes},
+    }
+
+
+def export_result(filepath, result, source=None, fs=None, chunk_size=DEFAULT_CHUNK_SIZE, report=None):
+    """
+    Write an analyze_ecg_file dict or a CTG_result to `filepath`.
+
+    `source` (the recording's path) is only recorded for reference. The file is written next to
+    its destination and renamed into place, so readers never see a partial file.
+    """
+    from app.CTGanalysis import CTG_result
+
+    report = report or _no_report
+    if isinstance(result, CTG_result):
+        kind, tables, values = CTG, ctg_tables(result), {}
+    else:
+        kind, tables = ECG, ecg_tables(result)
+        values = {"summary": result["summary"], "summary_text": result["summary_text"],
+                  "fs": fs or result["analysis"].fs}
+
+    report(0, "Chunking")
+    members = {}
+    layout = {}
+    for table, columns in tables.items():
+        time = np.asarray(columns["time"], dtype=np.float64)
+        starts = np.arange(0, len(time), chunk_size)
+        members[f"{table}/chunk_start"] = time[starts]  # Time of every chunk's first row
+        layout[table] = {"rows": len(time), "columns": {}}
+        for name, column in columns.items():
+            if column is None:
+                continue  # e.g. a CTG without UC
+            column = time if name == "time" else np.asarray(column)
+            layout[table]["columns"][name] = column.dtype.str
+            for chunk, start in enumerate(starts):
+                members[f"{table}/{name}/{chunk:05d}"] = column[start:start + chunk_size]
+
+    meta = {"format": FORMAT, "version": FORMAT_VERSION, "kind": kind, "source": source,
+            "chunk_size": chunk_size, "tables": layout, **values}
+    members[META_MEMBER] = np.array(json.dumps(meta))
+
+    report(20, "Compressing")
+    staging = filepath + ".tmp"
+    try:
+        with open(staging, "wb") as f:  # A file object, so NumPy does not append .npz to the name
+            np.savez_compressed(f, **members)
+        os.replace(staging, filepath)
+    except BaseException:
+        if os.path.exists(staging):
+            os.remove(staging)
+        raise
+    report(100, "Done")
+    return filepath
+
+
+class ResultFile:
+    """Read access to a file written by export_result; tables are read chunk by chunk on demand."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.npz = np.load(filepath, allow_pickle=False)
+        try:
+            self.meta = json.loads(str(self.npz[META_MEMBER]))
+        except (KeyError, ValueError):
+            self.npz.close()
+            raise ValueError(f"{filepath} is not a result file")
+        if self.meta.get("format") != FORMAT or self.meta.get("version", 0) > FORMAT_VERSION:
+            self.npz.close()
+            raise ValueError(f"{filepath} is not a result file this version can read")
+        self.kind = self.meta["kind"]
+        self.tables = self.meta["tables"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.npz.close()
+
+    def columns(self, table):
+        return list(self.tables[table]["columns"])
+
+    def time_range(self, table="signal"):
+        """(first, last) time of a table, or None when it is empty."""
+        starts = self.npz[f"{table}/chunk_start"]
+        if not len(starts):
+            return None
+        last_chunk = self.npz[f"{table}/time/{len(starts) - 1:05d}"]
+        return float(starts[0]), float(last_chunk[-1])
+
+    @staticmethod
+    def _first_chunk(starts, start):
+        # The last chunk starting before `start`; rows equal to `start` may end it
+        return max(int(np.searchsorted(starts, start, side="left")) - 1, 0)
+
+    def first_row(self, table, start):
+        """Index of the first row of `table` with time >= start, reading a single chunk."""
+        if start is None:
+            return 0
+        starts = self.npz[f"{table}/chunk_start"]
+        if not len(starts):
+            return 0
+        chunk = self._first_chunk(starts, start)
+        time = self.npz[f"{table}/time/{chunk:05d}"]
+        return chunk * self.meta["chunk_size"] + int(np.searchsorted(time, start, side="left"))
+
+    def read(self, table, start=None, stop=None, columns=None):
+        """
+        Return {column: array} of the rows of `table` with start <= time <= stop (either bound may
+        be None); only the chunks overlapping the range are decompressed. Columns missing from the
+        file (e.g. UC of a CTG without it) are None.
+        """
+        layout = self.tables[table]
+        columns = list(layout["columns"]) if columns is None else list(columns)
+        starts = self.npz[f"{table}/chunk_start"]
+        first = 0 if start is None else self._first_chunk(starts, start)
+        last = len(starts) if stop is None else np.searchsorted(starts, stop, side="right")
+
+        def load(name):
+            if name not in layout["columns"]:
+                return None
+            chunks = [self.npz[f"{table}/{name}/{chunk:05d}"] for chunk in range(first, last)]
+            return np.concatenate(chunks) if chunks else np.zeros(0, dtype=layout["columns"][name])
+
+        # Trim the partial first and last chunks on the time column
+        time = load("time")
+        lo = 0 if start is None else np.searchsorted(time, start, side="left")
+        hi = len(time) if stop is None else np.searchsorted(time, stop, side="right")
+        out = {}
+        for name in columns:
+            column = time if name == "time" else load(name)
+            out[name] = None if column is None else column[lo:hi]
+        return out
+
+    def read_records(self, table, start=None, stop=None, columns=None):
+        """Like `read`, but as one structured array (e.g. the rows of TREND_DTYPE or EPISODE_DTYPE)."""
+        data = self.read(table, start, stop, columns)
+        rows = len(next(iter(data.values())))
+        records = np.zeros(rows, dtype=[(name, column.dtype) for name, column in data.items()])
+        for name, column in data.items():
+            records[name] = column
+        return records
+
+
+def load_result(filepath, report=None, start=None, stop=None):
+    """
+    Load a result file as the result its pipeline returns: an analyze_ecg_file dict or a
+    CTG_result, limited to `start` <= time <= `stop` when given. Returns (kind, result).
+
+    Sample indices (R-peaks, accelerations, episodes) refer to the loaded range of the signal.
+    """
+    # Imported on first use, so importing this module at startup does not load SciPy
+    from app.CTGanalysis import CTG_result, EPISODE_DTYPE
+    from app.HRVanalysis import HRV_analysis, summary_from_json
+
+    report = report or _no_report
+    report(0, "Loading")
+    with ResultFile(filepath) as f:
+        kind = f.kind
+        # Named columns, so ones that were not written (UC of a CTG without it) come back as None
+        signal = f.read("signal", start, stop, columns=SIGNAL_COLUMNS[kind])
+        offset = f.first_row("signal", start)  # Indices are stored for the whole recording
+        if kind == ECG:
+            beats = f.read("beats", start, stop)
+            # Keep the intervals between loaded beats: drop the one that starts before `start` (or,
+            # in version 1 files stamped with the starting beat, the one that ends after `stop`)
+            rr = f.read("rr", start, stop)["rr"]
+            intervals = max(len(beats["time"]) - 1, 0)
+            rr = rr[:intervals] if f.meta["version"] < 2 else rr[len(rr) - intervals:]
+            trend = f.read_records("trend", start, stop) if "trend" in f.tables else None
+
+            # Restore the analysis state so the result behaves like a fresh one
+            analysis = HRV_analysis(signal["raw"], fs=f.meta["fs"])
+            analysis.filtered_data = signal["filtered"]
+            analysis.peaks = beats["peak"] - offset
+            analysis.rr_intervals = rr
+            result = {
+                "time": signal["time"],
+                "raw": signal["raw"],
+                "filtered": signal["filtered"],
+                "rr_intervals": rr,
+                "peak_times": beats["time"],
+                "trend": trend,
+                "summary": summary_from_json(f.meta["summary"]),  # Of the whole recording
+                "summary_text": f.meta["summary_text"],
+                "analysis": analysis,
+            }
+        else:
+            stv = f.read("stv", start, stop)
+            episodes = f.read_records("episodes", start, stop, columns=EPISODE_DTYPE.names)
+            episodes["start"] -= offset
+            episodes["end"] -= offset
+            result = CTG_result(signal["time"], signal["fhr"], signal["uc"], signal["baseline_fhr"],
+                                stv["time"], stv["stv"],
+                                f.read("accel", start, stop)["index"] - offset,
+                                f.read("decel", start, stop)["index"] - offset,
+                                episodes)
+    report(100, "Done")
+    return kind, result
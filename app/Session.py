@@ -0,0 +1,143 @@
+"""
+Sessions of many recordings, e.g. every ECG and CTG recording of one patient.
+
+Adding a recording only records its path and kind; it is analysed when first needed, on a worker
+thread, through the same pipelines (and ResultCache) as a single upload. Results are kept as the
+pipelines return them, NumPy arrays that are memory-mapped when served from the caches, and only
+for the `max_results` most recently used recordings; older ones are dropped and come back from
+the ResultCache without recomputation when they are viewed again.
+
+The model does not touch Qt: the GUI runs `Session.run` on its thread pool and hands the result
+back with `Session.store` on the GUI thread.
+"""
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from app.HRVtrend import rr_times
+from app.ResultFile import ECG, CTG, RESULT_FILE_EXTENSION, ResultFile, load_result
+
+# Recording states
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Plottable series of each kind of recording, by display name
+CHANNELS = {
+    ECG: ("RR Intervals (ms)", "Filtered ECG", "Raw ECG"),
+    CTG: ("FHR", "Baseline FHR", "Uterine Contraction", "STV"),
+}
+
+
+def is_result_file(filepath):
+    return str(filepath).lower().endswith(RESULT_FILE_EXTENSION)
+
+
+def detect_kind(filepath):
+    """The kind stored in a result file; for a CSV, CTG when its header has an FHR column, ECG otherwise."""
+    if is_result_file(filepath):
+        with ResultFile(filepath) as f:
+            return f.kind
+    with open(filepath, errors="replace") as f:  # A binary file reads as ECG and fails in its analysis
+        header = f.readline()
+    names = [name.strip().strip('"').upper() for name in header.split(",")]
+    return CTG if "FHR" in names else ECG
+
+
+class Recording:
+    def __init__(self, filepath, kind):
+        self.filepath = str(filepath)
+        self.name = os.path.basename(self.filepath)
+        self.kind = kind
+        self.status = PENDING
+        self.result = None  # analyze_ecg_file dict or CTG_result once analysed
+        self.error = None
+
+    def series(self, channel):
+        """Return (x, y) arrays of a channel from CHANNELS, or None when it is not available."""
+        result = self.result
+        if result is None:
+            return None
+        if self.kind == ECG:
+            if channel == "RR Intervals (ms)":
+                rr = result["rr_intervals"]
+                return rr_times(result["peak_times"], rr), np.asarray(rr) * 1000
+            if channel == "Filtered ECG" and result["filtered"] is not None:
+                return result["time"], result["filtered"]
+            if channel == "Raw ECG":
+                return result["time"], result["raw"]
+        else:
+            if channel == "FHR":
+                return result.time, result.fhr
+            if channel == "Baseline FHR":
+                return result.time, result.baseline_fhr
+            if channel == "Uterine Contraction" and result.uc is not None:
+                return result.time, result.uc
+            if channel == "STV":
+                return result.time_stv, result.stv
+        return None
+
+
+class Session:
+    def __init__(self, cache=None, max_results=32):
+        self.cache = cache
+        self.max_results = max_results
+        self.recordings = []
+        self._by_path = {}
+        self._loaded = OrderedDict()  # Recordings holding a result, least recently used first
+
+    def add(self, filepath, kind=None):
+        """Add a recording (once per path) without reading it; returns its Recording."""
+        path = os.path.abspath(filepath)
+        if path in self._by_path:
+            return self._by_path[path]
+        recording = Recording(filepath, kind or detect_kind(filepath))
+        self.recordings.append(recording)
+        self._by_path[path] = recording
+        return recording
+
+    def needs_analysis(self, recordings=None):
+        """Recordings without a result that are not being analysed and did not fail."""
+        recordings = self.recordings if recordings is None else recordings
+        return [r for r in recordings if r.result is None and r.status == PENDING]
+
+    def run(self, recording, report=None):
+        """Analyse a recording and return its result; safe to call from a worker thread."""
+        from app.Pipelines import analyze_ecg_file, analyze_ctg_file  # Loads SciPy, so only once needed
+
+        if is_result_file(recording.filepath):
+            return load_result(recording.filepath, report=report)[1]  # Saved analysis: nothing to recompute
+        if recording.kind == ECG:
+            return analyze_ecg_file(recording.filepath, report=report, cache=self.cache)
+        return analyze_ctg_file(recording.filepath, report=report, cache=self.cache)
+
+    def store(self, recording, result):
+        """Keep the result of `run`, dropping the least recently used results beyond `max_results`."""
+        recording.result = result
+        recording.status = DONE
+        recording.error = None
+        self.touch(recording)
+        while len(self._loaded) > self.max_results:
+            _, old = self._loaded.popitem(last=False)
+            old.result = None
+            old.status = PENDING  # Served from the ResultCache when needed again
+
+    def fail(self, recording, message):
+        recording.status = FAILED
+        recording.error = message
+
+    def touch(self, recording):
+        """Mark a recording's result as recently used."""
+        self._loaded[recording.filepath] = recording
+        self._loaded.move_to_end(recording.filepath)
+
+    def hrv_metrics(self, recordings=None):
+        """Return (names, HRVmulti.HRV_METRICS_DTYPE array) of the analysed ECG recordings among `recordings`."""
+        from app.HRVmulti import time_domain_metrics
+
+        recordings = self.recordings if recordings is None else recordings
+        analysed = [r for r in recordings if r.kind == ECG and r.result is not None]
+        metrics = time_domain_metrics([np.asarray(r.result["rr_intervals"]) for r in analysed])
+        return [r.name for r in analysed], metrics
@@ -0,0 +1,50 @@
+from PyQt5 import QtCore
+
+
+class CancelledError(Exception):
+    """Raised inside a worker when its job has been cancelled."""
+
+
+class WorkerSignals(QtCore.QObject):
+    """Signals of an AnalysisWorker; created on the GUI thread so emitted values are queued back to it."""
+    progress = QtCore.pyqtSignal(int, str)  # Percent done, stage name
+    result = QtCore.pyqtSignal(object)
+    error = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal()
+
+
+class AnalysisWorker(QtCore.QRunnable):
+    """
+    Run a pipeline function from app.Pipelines on a QThreadPool thread.
+
+    The pipeline is called as `fn(*args, report=..., **kwargs)`; every progress report is also a cancellation
+    point, so a cancelled job stops at its next stage and never emits a result.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report(self, percent, stage):
+        if self.cancelled:
+            raise CancelledError()
+        self.signals.progress.emit(percent, stage)
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, report=self.report, **self.kwargs)
+            if not self.cancelled:
+                self.signals.result.emit(result)
+        except CancelledError:
+            pass
+        except Exception as e:
+            self.signals.error.emit(f"{type(e).__name__}: {e}")
+        finally:
+            self.signals.finished.emit()
@@ -0,0 +1,242 @@
+"""
+Headless batch HRV analysis.
+
+Fans a directory of ECG recordings (Time, ECG CSVs such as static/datasets/ECG/*.csv) out over a
+process pool, runs filter -> peaks -> summary in each worker and streams one row per record to a
+CSV or Parquet file as results come back.
+
+Usage:
+    python -m app.batch static/datasets/ECG --output hrv_results.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from app.HRVanalysis import HRV_analysis
+from app.DataLoader import load_ecg
+from app.PeakDetectors import DETECTORS, PanTompkinsDetector
+
+# Summary keys from HRV_analysis.summarize_hrv mapped to output column names
+SUMMARY_COLUMNS = {
+    "Mean RR Interval (ms)": "mean_rr_ms",
+    "SDNN (ms)": "sdnn_ms",
+    "RMSSD (ms)": "rmssd_ms",
+    "pNN50 (%)": "pnn50_pct",
+    "Min RR Interval (ms)": "min_rr_ms",
+    "Max RR Interval (ms)": "max_rr_ms",
+    "Range RR Interval (ms)": "range_rr_ms",
+    "Total Power (ms²)": "total_power_ms2",
+    "LF Power (ms²)": "lf_power_ms2",
+    "HF Power (ms²)": "hf_power_ms2",
+    "LF/HF Ratio": "lf_hf_ratio",
+}
+COLUMNS = ["file", "samples", "peaks", *SUMMARY_COLUMNS.values(), "outliers", "seconds", "error"]
+
+
+def crashed_row(filepath):
+    """The row of a file whose worker process died before returning a result."""
+    row = dict.fromkeys(COLUMNS)
+    row["file"] = str(filepath)
+    row["error"] = "BrokenProcessPool: the worker process died while analysing this file"
+    return row
+
+
+def analyze_file(filepath, fs=500, use_cache=False, detector=None):
+    """Run the HRV pipeline on one ECG CSV and return a flat result row; errors are captured in the row."""
+    row = dict.fromkeys(COLUMNS)
+    row["file"] = str(filepath)
+    started = time.perf_counter()
+    try:
+        _, ecg = load_ecg(filepath, use_cache=use_cache)
+
+        analysis = HRV_analysis(ecg, fs=fs, detector=detector)
+        analysis.apply_filter()
+        analysis.calculate_hrv()
+        summary, _ = analysis.summarize_hrv()
+
+        row["samples"] = ecg.size
+        row["peaks"] = len(analysis.peaks)
+        for key, column in SUMMARY_COLUMNS.items():
+            row[column] = float(summary[key])
+        row["outliers"] = len(summary["Outliers (ms)"])
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - started, 4)
+    return row
+
+
+class CSVResultWriter:
+    """Append result rows to a CSV file, flushing after each row."""
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetResultWriter:
+    """Buffer result rows and write them to a Parquet file one row group at a time."""
+
+    def __init__(self, path, row_group_size=1_000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow. Install it or write to a .csv file instead.")
+
+        self.pa = pa
+        self.schema = pa.schema(
+            [("file", pa.string()), ("samples", pa.int64()), ("peaks", pa.int64())]
+            + [(column, pa.float64()) for column in SUMMARY_COLUMNS.values()]
+            + [("outliers", pa.int64()), ("seconds", pa.float64()), ("error", pa.string())]
+        )
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.row_group_size = row_group_size
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_table(self.pa.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def open_writer(path):
+    """Pick a result writer from the output file extension."""
+    if Path(path).suffix.lower() == ".parquet":
+        return ParquetResultWriter(path)
+    return CSVResultWriter(path)
+
+
+def find_recordings(directory, pattern="*.csv", recursive=False):
+    """Return the sorted list of recordings under a directory."""
+    directory = Path(directory)
+    files = directory.rglob(pattern) if recursive else directory.glob(pattern)
+    return sorted(path for path in files if path.is_file())
+
+
+def run_batch(files, output, fs=500, workers=None, max_pending=None, progress=True, use_cache=False,
+              detector=None):
+    """
+    Analyse every file over a process pool and stream the rows to `output`.
+
+    At most `max_pending` files are in flight at once, so memory is bounded by the pool and not by
+    the number of files. A file whose worker process dies (e.g. out of memory) gets an error row
+    like any other failure. Returns the number of records that failed.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    total = len(files)
+    done = failed = 0
+    started = time.perf_counter()
+
+    def record(row):
+        nonlocal done, failed
+        writer.write(row)
+        done += 1
+        if row["error"] is not None:
+            failed += 1
+
+        if progress:
+            rate = done / max(time.perf_counter() - started, 1e-9)
+            status = "failed: " + row["error"] if row["error"] else "ok"
+            print(f"[{done}/{total}] {row['file']} {status} ({rate:.1f} files/s)", file=sys.stderr)
+
+    writer = open_writer(output)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        remaining = iter(files)
+        pending = {}  # Future -> file
+        suspects = deque()  # Files in flight when a worker died, retried one at a time
+        while True:
+            isolated = bool(suspects)
+            if isolated:
+                if not pending:
+                    filepath = suspects.popleft()
+                    pending[pool.submit(analyze_file, filepath, fs, use_cache, detector)] = filepath
+            else:
+                for filepath in remaining:
+                    pending[pool.submit(analyze_file, filepath, fs, use_cache, detector)] = filepath
+                    if len(pending) >= max_pending:
+                        break
+
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in finished:
+                filepath = pending.pop(future)
+                try:
+                    row = future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    if not isolated:
+                        suspects.append(filepath)
+                        continue
+                    row = crashed_row(filepath)  # It died on its own: this file is the cause
+                record(row)
+
+            if broken:
+                # A worker died (e.g. killed for running out of memory) and took every file in flight
+                # with it. The pool cannot be used anymore, so start a fresh one and rerun those files
+                # alone to find the one that crashes it.
+                suspects.extend(pending.values())
+                pending = {}
+                pool.shutdown(wait=False)
+                pool = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        pool.shutdown()
+        writer.close()
+
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.batch", description="Batch HRV analysis of ECG CSV recordings.")
+    parser.add_argument("directory", help="Directory containing ECG CSV files (Time, ECG columns).")
+    parser.add_argument("-o", "--output", default="hrv_results.csv", help="Result file; .csv or .parquet.")
+    parser.add_argument("--pattern", default="*.csv", help="Glob pattern for recordings (default: *.csv).")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Search subdirectories as well.")
+    parser.add_argument("--fs", type=float, default=500, help="Sampling frequency in Hz (default: 500).")
+    parser.add_argument("--detector", choices=list(DETECTORS), default=PanTompkinsDetector.name,
+                        help="R-peak detector (default: pan_tompkins).")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--cache", action="store_true", help="Read and write the binary sidecar cache of each CSV.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not report progress.")
+    args = parser.parse_args(argv)
+
+    files = find_recordings(args.directory, args.pattern, args.recursive)
+    if not files:
+        print(f"No files matching {args.pattern} in {args.directory}", file=sys.stderr)
+        return 1
+
+    failed = run_batch(files, args.output, fs=args.fs, workers=args.workers, progress=not args.quiet,
+                       use_cache=args.cache, detector=args.detector)
+    print(f"Analysed {len(files)} recordings ({failed} failed) -> {args.output}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import pyqtgraph as pg
+from PyQt5 import QtWidgets, QtCore
+
+from app.Session import CHANNELS, DONE, FAILED, RUNNING
+from app.ui.Design import MAIN_WINDOW_STYLE, LABEL_STYLE
+from app.ui.LODPlot import LODCurve
+
+STATUS_TEXT = {RUNNING: "analysing...", FAILED: "failed"}
+
+
+class ComparisonView(QtWidgets.QWidget):
+    """
+    Side-by-side or overlaid plots of the checked recordings of a Session.
+
+    Side by side, every recording gets its own row and all rows share the X axis of the first, so
+    zooming one zooms all; overlaid, they share one plot. Only checked recordings are analysed:
+    the view emits `analysis_needed` with the checked ones that have no result yet. Double-clicking
+    a recording emits `recording_activated` so the main window can show its full analysis.
+    """
+
+    recording_activated = QtCore.pyqtSignal(object)
+    analysis_needed = QtCore.pyqtSignal(list)
+
+    def __init__(self, session, parent=None):
+        super().__init__(parent)
+        self.session = session
+        self.curves = []
+        self.setWindowTitle("Compare Recordings")
+        self.setStyleSheet(MAIN_WINDOW_STYLE + LABEL_STYLE)
+        self.resize(1200, 800)
+
+        self.recording_list = QtWidgets.QListWidget()
+        self.recording_list.setMaximumWidth(320)
+        self.recording_list.itemChanged.connect(self.on_item_changed)
+        self.recording_list.itemDoubleClicked.connect(
+            lambda item: self.recording_activated.emit(item.data(QtCore.Qt.UserRole)))
+
+        self.channel_combo = QtWidgets.QComboBox()
+        self.channel_combo.addItems([channel for channels in CHANNELS.values() for channel in channels])
+        self.channel_combo.currentTextChanged.connect(self.redraw)
+
+        self.overlay_check = QtWidgets.QCheckBox("Overlay")
+        self.overlay_check.toggled.connect(self.redraw)
+
+        controls = QtWidgets.QVBoxLayout()
+        controls.addWidget(self.channel_combo)
+        controls.addWidget(self.overlay_check)
+        controls.addWidget(self.recording_list)
+
+        self.metrics_label = QtWidgets.QLabel()
+        self.metrics_label.setMaximumWidth(320)
+        self.metrics_label.setWordWrap(True)
+        controls.addWidget(self.metrics_label)
+
+        self.graphics = pg.GraphicsLayoutWidget()
+        self.graphics.setBackground('#001e1e')
+
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.addLayout(controls)
+        layout.addWidget(self.graphics, 1)
+
+        self.refresh()
+
+    def refresh(self):
+        """Sync the list with the session's recordings and their status."""
+        self.recording_list.blockSignals(True)
+        for row, recording in enumerate(self.session.recordings):
+            if row < self.recording_list.count():
+                item = self.recording_list.item(row)
+            else:
+                item = QtWidgets.QListWidgetItem()
+                item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+                item.setCheckState(QtCore.Qt.Unchecked)
+                item.setData(QtCore.Qt.UserRole, recording)
+                self.recording_list.addItem(item)
+            status = STATUS_TEXT.get(recording.status)
+            item.setText(f"{recording.name} [{recording.kind.upper()}]" + (f"  {status}" if status else ""))
+            item.setToolTip(recording.error or recording.filepath)
+        self.recording_list.blockSignals(False)
+
+    def selected(self):
+        """The checked recordings, in list order."""
+        items = (self.recording_list.item(row) for row in range(self.recording_list.count()))
+        return [item.data(QtCore.Qt.UserRole) for item in items if item.checkState() == QtCore.Qt.Checked]
+
+    def on_item_changed(self, item):
+        self.redraw()
+        missing = self.session.needs_analysis(self.selected())
+        if missing:
+            self.analysis_needed.emit(missing)
+
+    def on_recording_updated(self, recording):
+        """Called when a recording finished (or failed) analysing."""
+        self.refresh()
+        if recording in self.selected():
+            self.redraw()
+
+    def show_metrics(self, recordings):
+        """Time-domain HRV metrics of the checked ECG recordings, one line each."""
+        names, metrics = self.session.hrv_metrics(recordings)
+        self.metrics_label.setText("\n".join(
+            f"{name}: SDNN {row['sdnn'] * 1000:.1f} ms, RMSSD {row['rmssd'] * 1000:.1f} ms, pNN50 {row['pnn50']:.1f}%"
+            for name, row in zip(names, metrics)))
+
+    def redraw(self):
+        for curve in self.curves:
+            curve.detach()
+        self.curves = []
+        self.graphics.clear()
+
+        channel = self.channel_combo.currentText()
+        selected = self.selected()
+        self.show_metrics(selected)
+        series = []
+        for recording in selected:
+            if recording.status == DONE:
+                self.session.touch(recording)
+            data = recording.series(channel)
+            if data is not None:
+                series.append((recording.name, data))
+        if not series:
+            return
+
+        if self.overlay_check.isChecked():
+            plot = self.graphics.addPlot(row=0, col=0, title=channel)
+            plot.showGrid(x=True, y=True, alpha=0.3)
+            plot.addLegend()
+            for index, (name, (x, y)) in enumerate(series):
+                pen = pg.mkPen(pg.intColor(index, hues=max(len(series), 2)))
+                self.curves.append(LODCurve(plot, x, y, pen=pen, name=name))
+        else:
+            first = None
+            for row, (name, (x, y)) in enumerate(series):
+                plot = self.graphics.addPlot(row=row, col=0, title=name)
+                plot.showGrid(x=True, y=True, alpha=0.3)
+                if first is None:
+                    first = plot
+                else:
+                    plot.setXLink(first)  # Linked X axes: zooming one recording zooms all
+                self.curves.append(LODCurve(plot, x, y, pen='w'))
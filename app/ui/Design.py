@@ -1,6 +1,8 @@
 import pyqtgraph as pg
 from PyQt5 import QtWidgets, QtGui, QtCore
 
+from app.ui.LODPlot import LODCurve
+
 # Define style variables
 MAIN_WINDOW_STYLE = "background-color:#001e1e;"
 BUTTON_STYLE = ("QPushButton {"
@@ -32,6 +34,9 @@ class Ui_MainWindow(object):
         MainWindow.setFont(font)
         MainWindow.setStyleSheet(MAIN_WINDOW_STYLE)
 
+        # LODCurves drawn on each plot widget, kept alive until the plot is cleared
+        self.lod_curves = {}
+
         self.centralwidget = QtWidgets.QWidget(MainWindow)
         self.centralwidget.setObjectName("centralwidget")
 
@@ -74,10 +79,19 @@ class Ui_MainWindow(object):
         controller_layout = QtWidgets.QHBoxLayout(horizontalLayoutWidget_2)
         controller_layout.setContentsMargins(0, 0, 0, 0)
 
+        self.progress_label = QtWidgets.QLabel()
+        self.progress_label.setObjectName("progress_label")
+        self.progress_label.setStyleSheet(LABEL_STYLE)
+        self.progress_label.setAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        controller_layout.addWidget(self.progress_label)
+
         self.mode_button = self.addButton(controller_layout, "mode_button", "HRV Mode", 180, BUTTON_STYLE)
         self.is_current_mode_HRV = True
 
         self.upload_signal_button = self.addButton(controller_layout, "upload_signal_button", "Upload Signal", 180, BUTTON_STYLE)
+        self.save_button = self.addButton(controller_layout, "save_button", "Save", 100, BUTTON_STYLE)
+        self.live_button = self.addButton(controller_layout, "live_button", "Live", 100, BUTTON_STYLE)
+        self.session_button = self.addButton(controller_layout, "session_button", "Session", 100, BUTTON_STYLE)
         self.quit_app_button = self.addButton(controller_layout, "quit_app_button", "X", 50, QUIT_BUTTON_STYLE, True)
 
     def addButton(self, layout, object_name, text, max_size, style, is_bold=False):
@@ -106,11 +120,13 @@ class Ui_MainWindow(object):
         self.graph01_groupBox, self.plot_widget_01 = self.addGroupBox(main_grid_layout, "graph01_groupBox", "Raw Signal", 0, 0, True)
         self.graph02_groupBox, self.plot_widget_02 = self.addGroupBox(main_grid_layout, "graph02_groupBox", "Filtered Signal", 0, 1, True)
         self.graph03_groupBox, self.plot_widget_03 = self.addGroupBox(main_grid_layout, "graph03_groupBox", "HRV Metrics", 1, 0, True)
-        self.graph04_groupBox, self.plot_widget_04 = self.addGroupBox(main_grid_layout, "alert_messages_groupBox", "Acceleration/Deceleration",
-                                                                      1, 1, True, True)
+        # Only shown in FHR mode, so its plot is built on first use (see plot_widget_04)
+        self.graph04_groupBox, _ = self.addGroupBox(main_grid_layout, "alert_messages_groupBox", "Acceleration/Deceleration",
+                                                    1, 1, isHidden=True, isDeferred=True)
+        self._plot_widget_04 = None
         self.alert_messages_groupBox, self.stats_data_label = self.addGroupBox(main_grid_layout, "alert_messages_groupBox", "Stats", 1, 1)
 
-    def addGroupBox(self, layout, object_name, title, row, col, isGraph=False, isHidden=False):
+    def addGroupBox(self, layout, object_name, title, row, col, isGraph=False, isHidden=False, isDeferred=False):
         group_box = QtWidgets.QGroupBox()
         font = QtGui.QFont()
         font.setFamily("Hiragino Sans GB")
@@ -122,7 +138,9 @@ class Ui_MainWindow(object):
 
         widget = None  # Holds either the plot_widget or label
 
-        if isGraph:
+        if isDeferred:
+            pass  # Content is added when first needed
+        elif isGraph:
             widget = self.addGraphView(group_box)  # Plot widget is created
         else:
             # Create a QLabel to display HRV data
@@ -148,7 +166,8 @@ class Ui_MainWindow(object):
 
         if isHidden:
             group_box.hide()
-            widget.hide()
+            if widget is not None:
+                widget.hide()
 
         return group_box, widget
 
@@ -162,6 +181,25 @@ class Ui_MainWindow(object):
         group_box.setLayout(graph_layout)
         return plot_widget
 
+    @property
+    def plot_widget_04(self):
+        """The Acceleration/Deceleration plot, built the first time it is used."""
+        if self._plot_widget_04 is None:
+            self._plot_widget_04 = self.addGraphView(self.graph04_groupBox)
+        return self._plot_widget_04
+
+    def plot_lod(self, plot_widget, x, y, **plot_kwargs):
+        """Plot a line through the level-of-detail layer, so long signals only draw what is visible."""
+        curve = LODCurve(plot_widget, x, y, **plot_kwargs)
+        self.lod_curves.setdefault(plot_widget, []).append(curve)
+        return curve
+
+    def clear_plot(self, plot_widget):
+        """Clear a plot widget and release the level-of-detail curves drawn on it."""
+        for curve in self.lod_curves.pop(plot_widget, []):
+            curve.detach()
+        plot_widget.clear()
+
     # --------------------------------------------------------------------------------------------------------------------------------------
 
     def toggle_mode_design(self):
@@ -171,12 +209,42 @@ class Ui_MainWindow(object):
         self.is_current_mode_HRV = not self.is_current_mode_HRV
 
     def clear_all_plots(self):
-        self.plot_widget_01.clear()
-        self.plot_widget_02.clear()
-        self.plot_widget_03.clear()
-        self.plot_widget_04.clear()
+        self.clear_plot(self.plot_widget_01)
+        self.clear_plot(self.plot_widget_02)
+        self.clear_plot(self.plot_widget_03)
+        if self._plot_widget_04 is not None:
+            self.clear_plot(self._plot_widget_04)
         self.stats_data_label.setText("")
 
+    def show_progress(self, percent, stage=""):
+        """Show the progress of the running analysis; None clears it."""
+        if percent is None:
+            self.progress_label.setText("")
+        else:
+            self.progress_label.setText(f"{stage} {percent}%")
+
+    def show_profile_overlay(self, lines):
+        """Show profiling lines over the plots; None hides the overlay."""
+        if lines is None:
+            if getattr(self, "profile_overlay_label", None) is not None:
+                self.profile_overlay_label.hide()
+            return
+
+        if getattr(self, "profile_overlay_label", None) is None:
+            self.profile_overlay_label = QtWidgets.QLabel(self.centralwidget)
+            self.profile_overlay_label.setObjectName("profile_overlay_label")
+            font = QtGui.QFont("Menlo")
+            font.setStyleHint(QtGui.QFont.Monospace)
+            self.profile_overlay_label.setFont(font)
+            self.profile_overlay_label.setStyleSheet("color: white; background-color: rgba(0, 0, 0, 170); padding: 6px;")
+            self.profile_overlay_label.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+
+        self.profile_overlay_label.setText("\n".join(lines))
+        self.profile_overlay_label.adjustSize()
+        self.profile_overlay_label.move(20, 110)
+        self.profile_overlay_label.show()
+        self.profile_overlay_label.raise_()
+
     def adjust_titles(self):
         if self.is_current_mode_HRV:
             self.mode_button.setText("FHR Mode")
@@ -195,7 +263,7 @@ class Ui_MainWindow(object):
             self.show_widget([self.graph04_groupBox, self.plot_widget_04])
         else:
             self.show_widget([self.alert_messages_groupBox, self.stats_data_label])
-            self.hide_widget([self.graph04_groupBox, self.plot_widget_04])
+            self.hide_widget([self.graph04_groupBox])
 
     def show_widget(self, List):
         for n in List:
@@ -0,0 +1,126 @@
+import numpy as np
+import pyqtgraph as pg
+
+# Curves at or below this many points are drawn directly, without a pyramid
+DIRECT_PLOT_POINTS = 20_000
+
+
+class DecimationPyramid:
+    """
+    Min/max decimation levels of a signal with increasing x values.
+
+    Level 0 is the signal itself. Every further level splits the previous one into buckets of
+    `factor` and keeps each bucket's minimum and maximum, so spikes survive decimation. The whole
+    pyramid is built once in O(n) and costs about 2/(factor - 1) of the signal's memory.
+    """
+
+    def __init__(self, x, y, factor=4, min_buckets=1_000):
+        self.factor = factor
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.levels = [(self.x, self.y)]
+
+        starts = np.arange(0, self.x.size, factor)
+        mins = np.minimum.reduceat(self.y, starts) if starts.size else np.empty(0)
+        maxs = np.maximum.reduceat(self.y, starts) if starts.size else np.empty(0)
+        bucket_x = self.x[starts]
+        while starts.size > min_buckets:
+            self.levels.append(self._interleave(bucket_x, mins, maxs))
+            starts = np.arange(0, mins.size, factor)
+            mins = np.minimum.reduceat(mins, starts)
+            maxs = np.maximum.reduceat(maxs, starts)
+            bucket_x = bucket_x[starts]
+        self.levels.append(self._interleave(bucket_x, mins, maxs))
+
+    @staticmethod
+    def _interleave(bucket_x, mins, maxs):
+        """Emit each bucket as a (min, max) pair of points at the bucket's start."""
+        x = np.repeat(bucket_x, 2)
+        y = np.empty(2 * mins.size)
+        y[0::2] = mins
+        y[1::2] = maxs
+        return x, y
+
+    def select(self, x_min, x_max, max_points):
+        """
+        Pick the finest level whose slice covering [x_min, x_max] has at most `max_points` points.
+
+        Returns (level, start, stop); the points are self.levels[level][0 or 1][start:stop].
+        """
+        for level, (x, _) in enumerate(self.levels):
+            start = max(int(np.searchsorted(x, x_min, side='left')) - 2, 0)
+            stop = min(int(np.searchsorted(x, x_max, side='right')) + 2, x.size)
+            if stop - start <= max_points or level == len(self.levels) - 1:
+                return level, start, stop
+
+
+class PyramidCurveItem(pg.PlotDataItem):
+    """PlotDataItem that reports the bounds of the whole signal, not of the pyramid slice it holds."""
+
+    full_bounds = None  # ((x_min, x_max), (y_min, y_max)), set by LODCurve
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        if self.full_bounds is None:
+            return super().dataBounds(ax, frac, orthoRange)
+        return self.full_bounds[ax]  # Auto-range over the whole signal
+
+
+class LODCurve:
+    """
+    Level-of-detail line on a PlotWidget created by Ui_MainWindow.addGraphView.
+
+    The curve only ever holds the pyramid level that matches the visible X range and the widget's
+    pixel width, and swaps levels when the view range changes, so pan/zoom cost does not depend on
+    the length of the recording.
+    """
+
+    def __init__(self, plot_widget, x, y, points_per_pixel=2, **plot_kwargs):
+        self.plot_widget = plot_widget
+        self.view_box = plot_widget.getViewBox()
+        self.points_per_pixel = points_per_pixel
+        self.pyramid = None
+        self.selection = None
+
+        x = np.asarray(x)
+        y = np.asarray(y)
+        if x.size <= DIRECT_PLOT_POINTS:
+            self.item = plot_widget.plot(x, y, **plot_kwargs)
+            return
+
+        self.pyramid = DecimationPyramid(x, y)
+        coarse_x, coarse_y = self.pyramid.levels[-1]
+        # Start from the coarsest level so auto-range sees the full extent, then follow the view
+        self.item = PyramidCurveItem(coarse_x, coarse_y, **plot_kwargs)
+        self.item.full_bounds = ((x[0], x[-1]), (np.min(coarse_y), np.max(coarse_y)))
+        plot_widget.addItem(self.item)
+        # The view box only holds this slot weakly; whoever plots the curve keeps it alive (see Ui_MainWindow.plot_lod)
+        self.view_box.sigXRangeChanged.connect(self.update)
+
+    def max_points(self):
+        width = int(self.view_box.width()) or self.plot_widget.width()
+        return max(width, 500) * self.points_per_pixel
+
+    def update(self, *args):
+        """Serve the pyramid level matching the visible X range."""
+        if self.item.scene() is None:
+            # The widget was cleared; stop following its view range
+            self.detach()
+            return
+
+        x_min, x_max = self.view_box.viewRange()[0]
+        selection = self.pyramid.select(x_min, x_max, self.max_points())
+        if selection == self.selection:
+            return  # Avoid feeding setData back into another range change
+        self.selection = selection
+
+        level, start, stop = selection
+        x, y = self.pyramid.levels[level]
+        self.item.setData(x[start:stop], y[start:stop])
+
+    def detach(self):
+        if self.pyramid is not None:
+            try:
+                self.view_box.sigXRangeChanged.disconnect(self.update)
+            except TypeError:
+                pass
+            self.pyramid = None
@@ -0,0 +1,111 @@
+"""
+Equivalence of the vectorised acceleration/deceleration detector with the original loop.
+
+identify_accel_decel is checked against the per-sample loop it replaced on synthetic FHR traces,
+including the boundary lengths around 2 * duration samples where the first change becomes
+available and non-positive thresholds, where the loop's elif keeps accelerations and
+decelerations exclusive. LiveCTG fed the same trace in small blocks and the episodes of
+segment_episodes must flag the same samples. Exits with
+status 1 on any mismatch.
+
+Usage:
+    python -m benchmarks.accel_decel
+    python -m benchmarks.accel_decel --durations 2 3 5 --samples 100000 --thresholds 0.1
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from app.CTGanalysis import ACCEL, DECEL, identify_accel_decel, segment_episodes
+from app.LiveFeed import LiveCTG
+from benchmarks.synthetic import synthetic_ctg
+
+
+def reference_accel_decel(fhr, threshold=0.1, duration=3):
+    """The per-sample loop identify_accel_decel replaced, kept as the reference."""
+    accel_indices = []
+    decel_indices = []
+    smoothed_fhr = np.convolve(fhr, np.ones(duration) / duration, mode='valid')
+    for i in range(len(smoothed_fhr) - duration):
+        change = smoothed_fhr[i + duration] - smoothed_fhr[i]
+        if change >= threshold:
+            accel_indices.append(i + duration // 2)
+        elif change <= -threshold:
+            decel_indices.append(i + duration // 2)
+    return accel_indices, decel_indices
+
+
+def live_accel_decel(time_values, fhr, duration, threshold=0.1, block=7):
+    """Sample indices LiveCTG flags when the trace arrives `block` rows at a time."""
+    live = LiveCTG(capacity=fhr.size + 1, threshold=threshold, duration=duration)
+    for start in range(0, fhr.size, block):
+        live.push(np.column_stack((time_values[start:start + block], fhr[start:start + block])))
+    state = live.state.view()
+    indices = np.searchsorted(time_values, live.state_time.view())
+    return indices[state == ACCEL], indices[state == DECEL]
+
+
+def episodes_match(fhr, threshold, duration, expected):
+    """Whether the episodes of segment_episodes cover exactly the samples the reference flags."""
+    episodes = segment_episodes(fhr, threshold=threshold, duration=duration)
+    for kind, indices in zip((ACCEL, DECEL), expected):
+        runs = episodes[episodes["kind"] == kind]
+        covered = np.concatenate([np.arange(start, end + 1) for start, end in zip(runs["start"], runs["end"])] or
+                                 [np.zeros(0, dtype=np.int64)])
+        if not np.array_equal(covered, indices):
+            return False
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.accel_decel", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--durations", type=int, nargs="+", default=[1, 2, 3, 4, 5],
+                        help="Smoothing windows (samples) to check.")
+    parser.add_argument("--samples", type=int, default=20_000, help="Length of the long synthetic trace.")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.1, 0.0, -0.5],
+                        help="Change thresholds in bpm to check; non-positive ones test that a sample is "
+                             "never both an acceleration and a deceleration.")
+    args = parser.parse_args(argv)
+
+    time_values, fhr, _ = synthetic_ctg(args.samples, fs=4)
+    failures = []
+
+    print("Lengths (boundaries around 2 * duration, then the long trace)")
+    for threshold in args.thresholds:
+        for duration in args.durations:
+            lengths = [duration, 2 * duration - 1, 2 * duration, 2 * duration + 1, 2 * duration + 2, args.samples]
+            for length in sorted(set(length for length in lengths if length <= args.samples)):
+                expected = reference_accel_decel(fhr[:length], threshold, duration)
+                accel, decel = identify_accel_decel(fhr[:length], threshold, duration)
+                same = np.array_equal(accel, expected[0]) and np.array_equal(decel, expected[1])
+                live_same = True
+                if length >= 2 * duration:
+                    live_accel, live_decel = live_accel_decel(time_values[:length], fhr[:length], duration, threshold)
+                    live_same = np.array_equal(live_accel, expected[0]) and np.array_equal(live_decel, expected[1])
+                print(f"  threshold {threshold:>5} duration {duration} length {length:>8,d}  "
+                      f"offline {'ok' if same else 'MISMATCH':<8} live {'ok' if live_same else 'MISMATCH'}")
+                case = f"threshold {threshold}, duration {duration}, length {length}"
+                if not same:
+                    failures.append(f"identify_accel_decel differs at {case}")
+                if not live_same:
+                    failures.append(f"LiveCTG differs at {case}")
+                if not episodes_match(fhr[:length], threshold, duration, expected):
+                    failures.append(f"segment_episodes differs at {case}")
+
+    started = time.perf_counter()
+    reference_accel_decel(fhr)
+    loop = time.perf_counter() - started
+    started = time.perf_counter()
+    identify_accel_decel(fhr)
+    vectorised = time.perf_counter() - started
+    print(f"Speed-up on {args.samples:,d} samples: x{loop / max(vectorised, 1e-9):.0f}")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
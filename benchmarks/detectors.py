@@ -0,0 +1,110 @@
+"""
+Accuracy and throughput of the R-peak detectors.
+
+Synthetic ECGs with known beat positions are scored for sensitivity, positive predictivity and F1
+(a detection within --tolerance seconds of a beat is a match) at several noise levels. The bundled
+recordings have no beat annotations, so they are checked for physiologically plausible RR
+intervals (--min-rr to --max-rr seconds) instead. Throughput is measured on a long synthetic ECG.
+Exits with status 1 when the Pan-Tompkins detector falls below --min-f1 or --min-plausible.
+
+Usage:
+    python -m benchmarks.detectors
+    python -m benchmarks.detectors --throughput-samples 50000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.DataLoader import load_ecg
+from app.FilterEngine import filter_signal
+from app.PeakDetectors import DETECTORS, PanTompkinsDetector
+from benchmarks.synthetic import synthetic_ecg
+
+DATASETS = Path(__file__).resolve().parent.parent / "static" / "datasets" / "ECG"
+
+
+def score(detected, truth, fs, tolerance=0.05):
+    """Return (sensitivity, positive predictivity, F1) of detected against true peak indices."""
+    if detected.size == 0 or truth.size == 0:
+        return 0.0, 0.0, 0.0
+    limit = tolerance * fs
+    # Distance from every true beat to the nearest detection, and vice versa
+    index = np.clip(np.searchsorted(detected, truth), 1, detected.size - 1)
+    to_truth = np.minimum(np.abs(detected[index] - truth), np.abs(detected[index - 1] - truth))
+    index = np.clip(np.searchsorted(truth, detected), 1, truth.size - 1)
+    to_detected = np.minimum(np.abs(truth[index] - detected), np.abs(truth[index - 1] - detected))
+
+    sensitivity = np.mean(to_truth <= limit)
+    predictivity = np.mean(to_detected <= limit)
+    f1 = 2 * sensitivity * predictivity / (sensitivity + predictivity) if sensitivity + predictivity else 0.0
+    return sensitivity, predictivity, f1
+
+
+def plausible_fraction(peaks, fs, min_rr=0.3, max_rr=2.0):
+    """Fraction of RR intervals within the physiological range."""
+    rr = np.diff(peaks) / fs
+    return float(np.mean((rr >= min_rr) & (rr <= max_rr))) if rr.size else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.detectors", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fs", type=float, default=500, help="Sampling frequency in Hz (default: 500).")
+    parser.add_argument("--noise", type=float, nargs="+", default=[0.05, 0.15, 0.3],
+                        help="Noise levels of the synthetic ECGs.")
+    parser.add_argument("--duration", type=float, default=600, help="Synthetic ECG length in seconds.")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Match tolerance in seconds.")
+    parser.add_argument("--min-rr", type=float, default=0.3, help="Shortest plausible RR interval in seconds.")
+    parser.add_argument("--max-rr", type=float, default=2.0, help="Longest plausible RR interval in seconds.")
+    parser.add_argument("--throughput-samples", type=int, default=10_000_000,
+                        help="Length of the throughput ECG in samples.")
+    parser.add_argument("--min-f1", type=float, default=0.95, help="Lowest acceptable Pan-Tompkins F1.")
+    parser.add_argument("--min-plausible", type=float, default=0.9,
+                        help="Lowest acceptable fraction of plausible RR intervals on the bundled recordings.")
+    args = parser.parse_args(argv)
+
+    fs = args.fs
+    detectors = {name: cls() for name, cls in DETECTORS.items()}
+    failures = []
+
+    print("Synthetic ECG (sensitivity / positive predictivity / F1)")
+    for noise in args.noise:
+        _, ecg, truth = synthetic_ecg(int(args.duration * fs), fs=fs, noise=noise)
+        filtered = filter_signal(ecg, fs)
+        for name, detector in detectors.items():
+            sensitivity, predictivity, f1 = score(detector.detect(filtered, fs), truth, fs, args.tolerance)
+            print(f"  noise {noise:<5} {name:<14} {sensitivity:7.3f} {predictivity:7.3f} {f1:7.3f}")
+            if name == PanTompkinsDetector.name and f1 < args.min_f1:
+                failures.append(f"F1 {f1:.3f} at noise {noise}")
+
+    print(f"Bundled recordings (peaks, fraction of RR in {args.min_rr}-{args.max_rr} s)")
+    for path in sorted(DATASETS.glob("*.csv")):
+        _, ecg = load_ecg(path, use_cache=False)
+        filtered = filter_signal(np.asarray(ecg, dtype=float), fs)
+        for name, detector in detectors.items():
+            peaks = detector.detect(filtered, fs)
+            fraction = plausible_fraction(peaks, fs, args.min_rr, args.max_rr)
+            print(f"  {path.name:<32} {name:<14} {peaks.size:6d} {fraction:7.3f}")
+            if name == PanTompkinsDetector.name and fraction < args.min_plausible:
+                failures.append(f"{path.name}: {fraction:.3f} plausible RR")
+
+    print(f"Throughput on {args.throughput_samples:,d} samples")
+    _, ecg, _ = synthetic_ecg(args.throughput_samples, fs=fs)
+    filtered = filter_signal(ecg, fs)
+    del ecg
+    for name, detector in detectors.items():
+        started = time.perf_counter()
+        detector.detect(filtered, fs)
+        seconds = time.perf_counter() - started
+        print(f"  {name:<14} {seconds:8.2f} s  {args.throughput_samples / seconds / 1e6:8.2f} M samples/s  "
+              f"{args.throughput_samples / fs / seconds:10,.0f} x real time")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
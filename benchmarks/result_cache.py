@@ -0,0 +1,91 @@
+"""
+Cold against warm ResultCache results of the analysis pipelines.
+
+Every bundled recording is analysed twice through a fresh cache: the first (cold) run computes
+the result and stores it, the second (warm) run is served from the cache. Both must hold the same
+values with the same types, down to the summary dictionary, and the time of each run is reported.
+Exits with status 1 on any mismatch.
+
+Usage:
+    python -m benchmarks.result_cache
+    python -m benchmarks.result_cache --ecg static/datasets/ECG/ECG_Person_01_rec_1_raw.csv
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.CTGanalysis import CTG_result
+from app.Pipelines import CTG_CACHED_ARRAYS, analyze_ctg_file, analyze_ecg_file
+from app.ResultCache import ResultCache
+
+DATASETS = Path(__file__).resolve().parent.parent / "static" / "datasets"
+
+
+def differences(cold, warm, path="result"):
+    """Paths at which `warm` differs from `cold` in value or type."""
+    if isinstance(cold, np.ndarray) or isinstance(warm, np.ndarray):
+        if not (isinstance(cold, np.ndarray) and isinstance(warm, np.ndarray)):
+            return [f"{path}: {type(cold).__name__} != {type(warm).__name__}"]
+        if cold.dtype != warm.dtype or not np.array_equal(cold, warm):
+            return [f"{path}: arrays differ"]
+        return []
+    if type(cold) is not type(warm):
+        return [f"{path}: {type(cold).__name__} != {type(warm).__name__}"]
+    if isinstance(cold, dict):
+        if cold.keys() != warm.keys():
+            return [f"{path}: keys {sorted(cold.keys() ^ warm.keys())} differ"]
+        return [diff for key in cold for diff in differences(cold[key], warm[key], f"{path}[{key!r}]")]
+    if isinstance(cold, (list, tuple)):
+        if len(cold) != len(warm):
+            return [f"{path}: lengths {len(cold)} != {len(warm)}"]
+        return [diff for index, (a, b) in enumerate(zip(cold, warm)) for diff in differences(a, b, f"{path}[{index}]")]
+    return [] if cold == warm else [f"{path}: {cold!r} != {warm!r}"]
+
+
+def comparable(result):
+    """The parts of a pipeline result that must survive the cache, as plain containers and arrays."""
+    if isinstance(result, CTG_result):
+        return {name: np.asarray(getattr(result, name)) for name in CTG_CACHED_ARRAYS}
+    out = {name: value for name, value in result.items() if name != "analysis"}
+    for name in ("time", "raw", "filtered", "rr_intervals", "peak_times", "trend"):
+        if out[name] is not None:
+            out[name] = np.asarray(out[name])  # Warm arrays are memory-mapped
+    out["peaks"] = np.asarray(result["analysis"].peaks)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.result_cache", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ecg", nargs="*", default=sorted(map(str, (DATASETS / "ECG").glob("*.csv"))),
+                        help="ECG recordings to check (default: the bundled ones).")
+    parser.add_argument("--ctg", nargs="*", default=sorted(map(str, (DATASETS / "FHR").glob("*.csv"))),
+                        help="CTG recordings to check (default: the bundled ones).")
+    args = parser.parse_args(argv)
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResultCache(directory)
+        print(f"{'recording':<40} {'cold':>10} {'warm':>10}")
+        for analyze, files in ((analyze_ecg_file, args.ecg), (analyze_ctg_file, args.ctg)):
+            for filepath in files:
+                started = time.perf_counter()
+                cold = analyze(filepath, cache=cache)
+                computed = time.perf_counter()
+                warm = analyze(filepath, cache=cache)
+                served = time.perf_counter()
+                print(f"{Path(filepath).name:<40} {(computed - started) * 1000:8.1f} ms "
+                      f"{(served - computed) * 1000:8.1f} ms")
+                failures += [f"{Path(filepath).name} {diff}"
+                             for diff in differences(comparable(cold), comparable(warm))]
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Stage-level benchmarks of the HRV and CTG pipelines on synthetic signals.
+
+Times every stage of HRV_analysis (apply_filter, calculate_hrv, summarize_hrv) and of CTG_analysis
+(baseline, STV, accel/decel) at each requested signal length, records throughput and peak traced
+memory, and writes the results to a JSON baseline. With --compare, the run is checked against an
+earlier baseline and exits with status 1 when a stage got slower than the tolerance allows.
+
+Usage:
+    python -m benchmarks.run --output benchmarks/baseline.json
+    python -m benchmarks.run --sizes 10000 1000000 100000000 --compare benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+
+from app.HRVanalysis import HRV_analysis
+from app.CTGanalysis import CTG_analysis
+from benchmarks.synthetic import synthetic_ecg, synthetic_ctg
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def hrv_stages(ecg, fs):
+    """Yield (stage name, callable) for the HRV pipeline; stages run in order on one instance."""
+    analysis = HRV_analysis(ecg, fs=fs)
+
+    def summarize_hrv():
+        # Reassigning the RR intervals clears the statistics cache, so every timed call computes them
+        analysis.rr_intervals = analysis.rr_intervals
+        return analysis.summarize_hrv()
+
+    yield "apply_filter", analysis.apply_filter
+    yield "calculate_hrv", analysis.calculate_hrv
+    yield "summarize_hrv", summarize_hrv
+
+
+def ctg_stages(time_values, fhr, uc):
+    """Yield (stage name, callable) for the CTG pipeline."""
+    analysis = CTG_analysis(time_values, fhr, uc)
+    yield "baseline", analysis.calculate_baseline
+    yield "stv", analysis.calculate_stv
+    yield "accel_decel", analysis.detect_accel_decel
+
+
+def measure(fn, repeat):
+    """Return (best wall time over `repeat` calls, peak bytes traced during one extra call)."""
+    best = np.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+
+    # Memory is traced in a separate call so tracing overhead does not skew the timing
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_pipeline(name, stages, n_samples, repeat, log):
+    results = []
+    for stage, fn in stages:
+        seconds, peak = measure(fn, repeat)
+        results.append({
+            "pipeline": name,
+            "stage": stage,
+            "samples": n_samples,
+            "seconds": seconds,
+            "throughput": n_samples / seconds if seconds > 0 else None,  # Samples per second
+            "peak_bytes": peak,
+        })
+        log(f"{name:>4} {stage:<14} {n_samples:>12,d} samples  {seconds * 1_000:10.2f} ms  "
+            f"{n_samples / max(seconds, 1e-12) / 1e6:10.2f} M samples/s  {peak / 2 ** 20:9.1f} MiB")
+    return results
+
+
+def run_benchmarks(sizes, fs=500, ctg_fs=4, repeat=3, pipelines=("hrv", "ctg"), log=print):
+    results = []
+    for n_samples in sizes:
+        if "hrv" in pipelines:
+            _, ecg, _ = synthetic_ecg(n_samples, fs=fs)
+            results += run_pipeline("hrv", hrv_stages(ecg, fs), n_samples, repeat, log)
+            del ecg
+        if "ctg" in pipelines:
+            time_values, fhr, uc = synthetic_ctg(n_samples, fs=ctg_fs)
+            results += run_pipeline("ctg", ctg_stages(time_values, fhr, uc), n_samples, repeat, log)
+            del time_values, fhr, uc
+    return results
+
+
+def compare(results, baseline, tolerance, min_seconds=0.005, log=print):
+    """
+    Log the slowdown of every stage against `baseline`; return the stages slower than `tolerance`.
+
+    Stages faster than `min_seconds` are reported but never flagged, since their timing is mostly noise.
+    """
+    previous = {(r["pipeline"], r["stage"], r["samples"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["pipeline"], result["stage"], result["samples"]))
+        if old is None or not old["seconds"]:
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        regressed = ratio > tolerance and result["seconds"] >= min_seconds
+        flag = "REGRESSION" if regressed else ""
+        log(f"{result['pipeline']:>4} {result['stage']:<14} {result['samples']:>12,d}  x{ratio:5.2f} {flag}")
+        if regressed:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Signal lengths in samples.")
+    parser.add_argument("--fs", type=float, default=500, help="ECG sampling frequency in Hz (default: 500).")
+    parser.add_argument("--ctg-fs", type=float, default=4, help="FHR/UC sampling frequency in Hz (default: 4).")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed calls per stage; the best is kept.")
+    parser.add_argument("--pipelines", nargs="+", choices=["hrv", "ctg"], default=["hrv", "ctg"])
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON file to check the results against.")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Allowed slowdown factor before a stage counts as a regression (default: 1.25).")
+    parser.add_argument("--min-seconds", type=float, default=0.005,
+                        help="Stages faster than this are never flagged as regressions (default: 0.005).")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.fs, args.ctg_fs, args.repeat, args.pipelines)
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "platform": platform.platform(),
+            "fs": args.fs,
+            "ctg_fs": args.ctg_fs,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than x{args.tolerance} of {args.compare}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
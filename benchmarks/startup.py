@@ -0,0 +1,84 @@
+"""
+Startup time of the GUI against a budget.
+
+Each run starts a fresh interpreter, imports app.Controller and builds the MainController (the
+window is not shown), and reports both times plus which heavy modules got loaded on the way.
+The analysis stack (SciPy, pandas and the modules built on them) is meant to load on the first
+upload or analysis, not at startup. Exits with status 1 when the median startup time exceeds
+--budget or a module from --forbid was imported, so CI can run it as a gate against startup
+regressions.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --budget 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# About 1.5x the measured median (~0.4 s); importing SciPy and pandas as well takes it past this
+DEFAULT_BUDGET = 0.6
+
+DEFAULT_FORBIDDEN = ["scipy", "pandas", "app.Pipelines", "app.HRVanalysis", "app.CTGanalysis", "app.LiveFeed"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from app.Controller import MainController
+imported = time.perf_counter()
+controller = MainController()
+built = time.perf_counter()
+print(json.dumps({"import": imported - started, "construct": built - imported, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure():
+    """Run the probe in a fresh interpreter; returns its dict of times (s) and loaded modules."""
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")  # No display needed; the window is never shown
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time (default: 5).")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help=f"Largest allowed median of import + construction time in seconds (default: {DEFAULT_BUDGET}).")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN,
+                        help="Modules that must not be imported at startup.")
+    args = parser.parse_args(argv)
+
+    runs = [measure() for _ in range(args.runs)]
+    imports = [run["import"] for run in runs]
+    constructs = [run["construct"] for run in runs]
+    totals = [a + b for a, b in zip(imports, constructs)]
+
+    print(f"Startup over {args.runs} runs (median / min)")
+    for name, times in (("import app.Controller", imports), ("MainController()", constructs), ("total", totals)):
+        print(f"  {name:<22} {statistics.median(times) * 1000:8.1f} ms {min(times) * 1000:8.1f} ms")
+
+    failures = []
+    median = statistics.median(totals)
+    if median > args.budget:
+        failures.append(f"startup takes {median:.3f} s, over the {args.budget:.3f} s budget")
+    loaded = set(runs[-1]["modules"])
+    for module in args.forbid:
+        if module in loaded:
+            failures.append(f"{module} is imported at startup")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
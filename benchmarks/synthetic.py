@@ -0,0 +1,67 @@
+"""Synthetic long-signal generators for the benchmarks."""
+import numpy as np
+from scipy.signal import oaconvolve
+
+
+def synthetic_ecg(n_samples, fs=500, heart_rate=70, hrv=0.05, noise=0.05, seed=0):
+    """
+    Generate an ECG-like signal of `n_samples` at `fs` Hz.
+
+    Beats are Gaussian QRS/T bumps placed at RR intervals that vary by `hrv` (relative standard
+    deviation) around `heart_rate`, on a slow baseline wander plus white noise. Returns (time, ecg, peaks).
+    """
+    rng = np.random.default_rng(seed)
+    time = np.arange(n_samples) / fs
+    duration = n_samples / fs
+
+    mean_rr = 60 / heart_rate
+    n_beats = int(duration / mean_rr) + 2
+    rr = mean_rr * (1 + hrv * rng.standard_normal(n_beats))
+    beat_times = np.cumsum(np.clip(rr, 0.3, 2.0))
+    beat_times = beat_times[beat_times < duration]
+    peaks = np.round(beat_times * fs).astype(np.int64)
+
+    # Add the same beat template at every beat with one scatter-add per template sample
+    template_t = np.arange(-int(0.2 * fs), int(0.4 * fs)) / fs
+    template = (np.exp(-(template_t / 0.012) ** 2)
+                - 0.15 * np.exp(-((template_t + 0.03) / 0.01) ** 2)
+                + 0.25 * np.exp(-((template_t - 0.25) / 0.04) ** 2))
+    offsets = np.round(template_t * fs).astype(np.int64)
+
+    ecg = 0.1 * np.sin(2 * np.pi * 0.3 * time)  # Baseline wander
+    ecg += noise * rng.standard_normal(n_samples)
+    for offset, value in zip(offsets, template):
+        index = peaks + offset
+        index = index[(index >= 0) & (index < n_samples)]
+        ecg[index] += value
+    return time, ecg, peaks
+
+
+def synthetic_ctg(n_samples, fs=1, baseline=140, seed=0):
+    """
+    Generate FHR and UC traces of `n_samples` at `fs` Hz.
+
+    FHR is a slowly wandering baseline with beat-to-beat variability and occasional
+    accelerations and decelerations; UC is a train of contraction bumps every ~3 minutes.
+    Returns (time, fhr, uc).
+    """
+    rng = np.random.default_rng(seed)
+    time = np.arange(n_samples) / fs
+
+    fhr = baseline + np.cumsum(rng.standard_normal(n_samples)) * 0.05
+    # Keep the wander bounded; overlap-add is O(n log k) where np.convolve is O(n k) for the 301 taps
+    fhr -= oaconvolve(fhr - baseline, np.ones(301) / 301, mode='same')
+    fhr += rng.standard_normal(n_samples) * 1.5
+
+    # Accelerations (+15 bpm) and decelerations (-20 bpm) lasting about 20 s
+    bump = np.hanning(int(20 * fs) + 1)
+    offsets = np.arange(bump.size) - bump.size // 2
+    for amplitude in (15, -20):
+        centres = rng.integers(0, n_samples, size=max(1, int(n_samples // (600 * fs))))
+        for offset, value in zip(offsets, bump):
+            index = centres + offset
+            np.add.at(fhr, index[(index >= 0) & (index < n_samples)], amplitude * value)
+
+    uc = 10 + 40 * np.clip(np.sin(2 * np.pi * time / 180), 0, None) ** 4
+    uc += rng.standard_normal(n_samples)
+    return time, fhr, uc